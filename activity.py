@@ -0,0 +1,74 @@
+import bisect
+from collections import Counter
+from datetime import date
+
+# --- Per-user activity log ---
+# viewed_calendar holds "YYYY-MM-DD" strings; this keeps them as sorted day ordinals plus a set,
+# so day lookups are O(1), month ranges are a bisect, and streaks are one pass computed once.
+
+def _ordinal(day):
+    if isinstance(day, str): day = date.fromisoformat(day)
+    return day.toordinal()
+
+class ActivityLog:
+    def __init__(self, day_strings=()):
+        ordinals = set()
+        for d in day_strings:
+            try:
+                ordinals.add(_ordinal(d))
+            except ValueError:
+                continue  # ignore malformed entries rather than breaking the calendar
+        self._days = ordinals
+        self.ordinals = sorted(ordinals)
+        self._longest = None
+
+    def __len__(self): return len(self.ordinals)
+    def __contains__(self, day): return _ordinal(day) in self._days
+    def has_day(self, day): return day in self
+
+    def days_in_month(self, year, month):
+        first = date(year, month, 1)
+        nxt = date(year + month // 12, month % 12 + 1, 1)
+        lo = bisect.bisect_left(self.ordinals, first.toordinal())
+        hi = bisect.bisect_left(self.ordinals, nxt.toordinal())
+        return {date.fromordinal(o).day for o in self.ordinals[lo:hi]}
+
+    def longest_streak(self):
+        if self._longest is None:
+            best = run = 0
+            prev = None
+            for o in self.ordinals:
+                run = run + 1 if prev is not None and o == prev + 1 else 1
+                best = max(best, run)
+                prev = o
+            self._longest = best
+        return self._longest
+
+    def current_streak(self, today=None):
+        # A streak is still alive if the last active day is today or yesterday
+        today = (today or date.today()).toordinal()
+        day = today if today in self._days else today - 1
+        run = 0
+        while day in self._days:
+            run += 1
+            day -= 1
+        return run
+
+    def weekly_counts(self):
+        # {(iso_year, iso_week): active days}
+        return Counter(date.fromordinal(o).isocalendar()[:2] for o in self.ordinals)
+
+    def monthly_counts(self):
+        # {(year, month): active days}
+        return Counter((d.year, d.month) for d in map(date.fromordinal, self.ordinals))
+
+    def last_n_days(self, n, today=None):
+        # Active-day count over the trailing n days including today
+        end = (today or date.today()).toordinal()
+        return bisect.bisect_right(self.ordinals, end) - bisect.bisect_left(self.ordinals, end - n + 1)
+
+
+def activity_of(user):
+    # Uses the User's cached log when it has one (models.User does); plain records get a fresh log
+    activity = getattr(user, "activity", None)
+    return activity if activity is not None else ActivityLog(user.viewed_calendar)
@@ -0,0 +1,72 @@
+import base64
+import io
+import os
+import threading
+from metrics import track
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# --- Static assets ---
+# Background images are resized/re-encoded once per process and re-done only when the source file's mtime changes.
+MAX_BG_WIDTH = 1920
+FALLBACK_BG = "linear-gradient(120deg, #171723 30%, #4674d9 100%)"
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _optimize(data, max_width):
+    # WebP when Pillow has it, otherwise a progressive JPEG; the original bytes if Pillow is missing
+    if Image is None: return data, "image/jpeg", "jpg"
+    img = Image.open(io.BytesIO(data))
+    if img.width > max_width:
+        img = img.resize((max_width, round(img.height * max_width / img.width)), Image.LANCZOS)
+    img = img.convert("RGB")
+    out = io.BytesIO()
+    try:
+        img.save(out, "WEBP", quality=75, method=4)
+        return out.getvalue(), "image/webp", "webp"
+    except (KeyError, OSError):
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=80, optimize=True, progressive=True)
+        return out.getvalue(), "image/jpeg", "jpg"
+
+def _build(path, mtime, max_width):
+    with open(path, "rb") as f: data = f.read()
+    data, mime, ext = _optimize(data, max_width)
+    # Write the variant next to the source so Streamlit's static serving can hand it out directly
+    variant = f"{os.path.splitext(path)[0]}.opt.{ext}"
+    try:
+        with open(variant + ".tmp", "wb") as f: f.write(data)
+        os.replace(variant + ".tmp", variant)
+    except OSError:
+        variant = None
+    return {
+        "mtime": mtime,
+        "data_url": f"url('data:{mime};base64,{base64.b64encode(data).decode()}')",
+        "variant": variant,
+    }
+
+def get_background(path, max_width=MAX_BG_WIDTH):
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    key = (path, max_width)
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is None or entry["mtime"] != mtime:
+            with track("background.encode", bytes_read=os.path.getsize(path)):
+                entry = _cache[key] = _build(path, mtime, max_width)
+        return entry
+
+def background_css(path, static_serving=False):
+    # CSS `background` value for the landing/sign-in pages
+    entry = get_background(path)
+    if entry is None: return FALLBACK_BG
+    if static_serving and entry["variant"] and os.path.basename(os.path.dirname(entry["variant"])) == "static":
+        # Streamlit serves ./static/* at app/static/*, so the browser fetches and caches the file once
+        return f"url('app/static/{os.path.basename(entry['variant'])}')"
+    return entry["data_url"]
@@ -0,0 +1,104 @@
+import base64
+import hashlib
+import io
+import os
+import re
+import threading
+from metrics import track
+from storage import FileLock
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow ships with Streamlit, but keep the store usable without it
+    Image = None
+
+# --- Content-addressed avatar store ---
+# Avatars are written once to <root>/<sha256>.<ext>; the user record only keeps the hash.
+THUMB_SIZE = (200, 200)  # sidebar shows avatars at width=100, so 2x for high-DPI screens
+_REF_RE = re.compile(r"^[0-9a-f]{64}$")
+MIGRATED_MARKER = ".inline-avatars-migrated"
+
+def is_avatar_ref(value):
+    return isinstance(value, str) and bool(_REF_RE.match(value))
+
+def _guess_ext(data):
+    if data[:8] == b"\x89PNG\r\n\x1a\n": return "png"
+    if data[:3] == b"\xff\xd8\xff": return "jpg"
+    return "img"
+
+class AvatarStore:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _find(self, ref, suffix=""):
+        for ext in ("jpg", "png", "img"):
+            path = os.path.join(self.root, f"{ref}{suffix}.{ext}")
+            if os.path.isfile(path): return path
+        return None
+
+    def put(self, data):
+        ref = hashlib.sha256(data).hexdigest()
+        if self._find(ref) is None:  # identical uploads are stored once
+            path = os.path.join(self.root, f"{ref}.{_guess_ext(data)}")
+            tmp = path + ".tmp"
+            with track("avatar.write", bytes_written=len(data)), open(tmp, "wb") as f: f.write(data)
+            os.replace(tmp, path)
+            with track("avatar.thumbnail"): self._make_thumbnail(ref, data)
+        return ref
+
+    def _make_thumbnail(self, ref, data):
+        if Image is None: return None
+        try:
+            img = Image.open(io.BytesIO(data))
+            img.thumbnail(THUMB_SIZE)
+            has_alpha = img.mode in ("RGBA", "LA", "P")
+            path = os.path.join(self.root, f"{ref}_thumb.{'png' if has_alpha else 'jpg'}")
+            if has_alpha:
+                img.save(path, "PNG", optimize=True)
+            else:
+                img.convert("RGB").save(path, "JPEG", quality=85, optimize=True)
+            return path
+        except Exception:
+            return None  # unreadable image: the original is still served
+
+    def path(self, ref):
+        return self._find(ref) if is_avatar_ref(ref) else None
+
+    def thumbnail_path(self, ref):
+        if not is_avatar_ref(ref): return None
+        return self._find(ref, "_thumb") or self.path(ref)
+
+
+def migrate_inline_avatars(user_store, avatar_store, batch_size=500):
+    # One-shot per data directory: replace base64 avatars embedded in user records with store references.
+    # A marker file skips the scan on later starts; the lock keeps workers that start together from both
+    # rewriting the same records.
+    marker = os.path.join(avatar_store.root, MIGRATED_MARKER)
+    if os.path.exists(marker): return 0
+    with FileLock(marker, timeout=300):
+        if os.path.exists(marker): return 0
+        moved, total = {}, 0
+        for email, data in user_store.iter_records():
+            avatar = data.get("avatar")
+            if avatar and not is_avatar_ref(avatar):
+                with track("avatar.decode", bytes_read=len(avatar)): raw = base64.b64decode(avatar)
+                data["avatar"] = avatar_store.put(raw)
+                moved[email] = data
+            if len(moved) >= batch_size:
+                user_store.put_many(moved)
+                total, moved = total + len(moved), {}
+        if moved: user_store.put_many(moved)
+        open(marker, "w").close()
+        return total + len(moved)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_avatar_store(root, user_store=None):
+    # Process-wide; the inline-avatar migration is checked once per process alongside store creation
+    with _stores_lock:
+        if root not in _stores:
+            _stores[root] = AvatarStore(root)
+            if user_store is not None: migrate_inline_avatars(user_store, _stores[root])
+        return _stores[root]
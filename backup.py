@@ -0,0 +1,117 @@
+import argparse
+import base64
+import os
+from itertools import islice
+from utils import read_ndjson, write_ndjson
+
+# --- Streaming backup / restore ---
+# Users, messages, plans and coach-client assignments are written as NDJSON, one record per line, and restored line by line through
+# generators, so memory use does not grow with the dataset (avatars included). Files ending in .gz are
+# compressed. User lines are {"email": ..., "record": {...}}; with avatars="inline" the image bytes travel
+# in "avatar_data" (base64), with avatars="none" the avatar is left out entirely. `role` only filters users:
+# messages, plans and the roster are always exported whole.
+USERS_NDJSON = "users.ndjson"
+MESSAGES_NDJSON = "messages.ndjson"
+PLANS_NDJSON = "plans.ndjson"
+ROSTER_NDJSON = "roster.ndjson"
+AVATAR_MODES = ("ref", "inline", "none")
+
+def iter_user_lines(user_store, role=None, avatars="ref", avatar_store=None):
+    for email, record in user_store.iter_records(role):
+        record = {k: v for k, v in record.items() if k != "version"}  # versions are local to a store
+        line = {"email": email, "record": record}
+        if avatars == "none":
+            record.pop("avatar", None)
+        elif avatars == "inline" and avatar_store is not None:
+            path = avatar_store.path(record.get("avatar"))
+            if path:
+                with open(path, "rb") as f: line["avatar_data"] = base64.b64encode(f.read()).decode()
+        yield line
+
+def export_users(user_store, filename, role=None, avatars="ref", avatar_store=None):
+    return write_ndjson(filename, iter_user_lines(user_store, role, avatars, avatar_store))
+
+def import_users(user_store, filename, role=None, avatar_store=None, batch_size=500):
+    # Existing accounts with the same email are overwritten; returns the number of users written
+    def records():
+        for line in read_ndjson(filename):
+            record = line["record"]
+            if role is not None and record.get("role", "Client") != role: continue
+            if line.get("avatar_data") and avatar_store is not None:
+                record["avatar"] = avatar_store.put(base64.b64decode(line["avatar_data"]))
+            yield line["email"], record
+    count, lines = 0, records()
+    while True:
+        batch = dict(islice(lines, batch_size))
+        if not batch: return count
+        user_store.put_many(batch)
+        count += len(batch)
+
+def export_messages(message_store, filename, coach_emails=None):
+    return write_ndjson(filename, message_store.iter_records(coach_emails))
+
+def import_messages(message_store, filename):
+    # Messages already in the store are skipped, so re-importing the same file adds nothing
+    return sum(message_store.restore(record) for record in read_ndjson(filename))
+
+def export_plans(plan_store, filename):
+    return write_ndjson(filename, plan_store.iter_records())
+
+def import_plans(plan_store, filename):
+    return sum(1 for record in read_ndjson(filename) if plan_store.restore(record))
+
+def export_roster(roster, filename):
+    return write_ndjson(filename, roster.iter_records())
+
+def import_roster(roster, filename, batch_size=500):
+    # Returns the number of assignments added; ones already present are skipped
+    count, records = 0, read_ndjson(filename)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch: return count
+        count += roster.restore(batch)
+
+
+def export_all(directory, user_store, message_store, plan_store, roster, role=None, avatars="ref", avatar_store=None,
+               compress=False):
+    os.makedirs(directory, exist_ok=True)
+    def path(name): return os.path.join(directory, name + (".gz" if compress else ""))
+    return {
+        "users": export_users(user_store, path(USERS_NDJSON), role, avatars, avatar_store),
+        "messages": export_messages(message_store, path(MESSAGES_NDJSON)),
+        "plans": export_plans(plan_store, path(PLANS_NDJSON)),
+        "roster": export_roster(roster, path(ROSTER_NDJSON)),
+    }
+
+def import_all(directory, user_store, message_store, plan_store, roster, role=None, avatar_store=None):
+    def path(name):
+        for candidate in (name, name + ".gz"):
+            if os.path.exists(os.path.join(directory, candidate)): return os.path.join(directory, candidate)
+        return None
+    counts = {}
+    if path(USERS_NDJSON): counts["users"] = import_users(user_store, path(USERS_NDJSON), role, avatar_store)
+    if path(MESSAGES_NDJSON): counts["messages"] = import_messages(message_store, path(MESSAGES_NDJSON))
+    if path(PLANS_NDJSON): counts["plans"] = import_plans(plan_store, path(PLANS_NDJSON))
+    if path(ROSTER_NDJSON): counts["roster"] = import_roster(roster, path(ROSTER_NDJSON))
+    return counts
+
+
+if __name__ == "__main__":
+    # Run from the app directory: python backup.py export backups/2025-08-01 --role Client --avatars none
+    parser = argparse.ArgumentParser(description="Stream users, messages, plans and the roster to or from NDJSON files")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("directory")
+    parser.add_argument("--role", choices=["Client", "Coach"],
+                        help="only export/import users with this role; messages, plans and the roster are always included")
+    parser.add_argument("--avatars", choices=AVATAR_MODES, default="ref",
+                        help="ref: keep avatar hashes (default), inline: embed the images, none: leave avatars out")
+    parser.add_argument("--gzip", action="store_true", help="compress the exported files")
+    args = parser.parse_args()
+
+    from services import user_store, message_store, plan_store, roster, avatar_store
+    if args.command == "export":
+        counts = export_all(args.directory, user_store, message_store, plan_store, roster, args.role,
+                            args.avatars, avatar_store, args.gzip)
+    else:
+        counts = import_all(args.directory, user_store, message_store, plan_store, roster, args.role, avatar_store)
+    print(", ".join(f"{n} {kind}" for kind, n in counts.items()))
@@ -0,0 +1,114 @@
+import re
+import threading
+from types import SimpleNamespace
+from activity import activity_of
+from storage import put_with_retry
+
+# --- Badge rule engine ---
+# Rules are parsed from the "requirements" strings in badges.json:
+#   "<n>_workouts"      n unique completed challenges
+#   "<n>_day_streak"    n consecutive days in viewed_calendar
+#   "<n>_body_parts"    completed challenges covering n distinct body parts
+#   "all_body_parts"    completed challenges covering every body part in the catalog
+# Each rule names the events that can change its outcome, so a completion only re-checks those rules.
+
+class CountRule:
+    triggers = {"completion"}
+    def __init__(self, n): self.n = n
+    def check(self, user, ctx): return len(user.completed_challenges) >= self.n
+
+class StreakRule:
+    triggers = {"completion", "calendar"}
+    def __init__(self, n): self.n = n
+    def check(self, user, ctx): return activity_of(user).longest_streak() >= self.n
+
+class BodyPartRule:
+    triggers = {"completion"}
+    def __init__(self, n=None): self.n = n  # None: every body part in the catalog
+    def check(self, user, ctx):
+        covered = {ctx["index"].body_part_of(t) for t in user.completed_challenges} - {None}
+        return len(covered) >= (self.n if self.n is not None else len(ctx["index"].body_parts))
+
+RULE_PATTERNS = [
+    (re.compile(r"^(\d+)_workouts$"), lambda m: CountRule(int(m.group(1)))),
+    (re.compile(r"^(\d+)_day_streak$"), lambda m: StreakRule(int(m.group(1)))),
+    (re.compile(r"^(\d+)_body_parts$"), lambda m: BodyPartRule(int(m.group(1)))),
+    (re.compile(r"^all_body_parts$"), lambda m: BodyPartRule()),
+]
+
+def parse_requirement(requirement):
+    for pattern, build in RULE_PATTERNS:
+        m = pattern.match(requirement)
+        if m: return build(m)
+    raise ValueError(f"Unknown badge requirement: {requirement!r}")
+
+
+def merge_badges(current, mine):
+    # The record changed since the backfill read it: add the awarded badges, leave every other field alone
+    if current is None: return mine
+    return dict(current, earned_badges=sorted(set(current.get("earned_badges", [])) | set(mine["earned_badges"])))
+
+
+class BadgeEngine:
+    def __init__(self, badges, exercise_index):
+        self.badges = badges
+        self.index = exercise_index
+        self.ctx = {"index": exercise_index}
+        self.rules = {b["name"]: [parse_requirement(r) for r in b.get("requirements", [])] for b in badges}
+        self._by_event = {}
+        for name, rules in self.rules.items():
+            for event in set().union(*(r.triggers for r in rules)) if rules else ():
+                self._by_event.setdefault(event, []).append(name)
+
+    def _earned(self, user, name):
+        return all(rule.check(user, self.ctx) for rule in self.rules[name])
+
+    def on_event(self, user, event):
+        # Only rules listening to this event, and only badges the user does not have yet
+        awarded = [
+            name for name in self._by_event.get(event, [])
+            if name not in user.earned_badges and self._earned(user, name)
+        ]
+        user.earned_badges.update(awarded)
+        return awarded
+
+    def evaluate_all(self, user):
+        awarded = [name for name in self.rules if name not in user.earned_badges and self._earned(user, name)]
+        user.earned_badges.update(awarded)
+        return awarded
+
+    def backfill(self, user_store, emails=None):
+        # Bulk mode: evaluate every rule for the given clients (None: every client); badges are only ever
+        # added, never revoked. Each changed record is written with a version check, so a save that lands
+        # meanwhile is kept.
+        total = 0
+        records = user_store.iter_records("Client") if emails is None else ((e, user_store.get(e)) for e in emails)
+        for email, data in records:
+            if data is None or data.get("role", "Client") != "Client": continue
+            user = SimpleNamespace(**{
+                field: set(data.get(field, []))
+                for field in ("completed_challenges", "viewed_calendar", "earned_badges")
+            })
+            if self.evaluate_all(user):
+                data["earned_badges"] = sorted(user.earned_badges)
+                put_with_retry(user_store, email, data, data["version"], merge_badges)
+                total += 1
+        return total
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_badge_engine(badges, exercise_index):
+    # Rebuilt only when the catalog hands out a new badges list or exercise index (i.e. a file changed)
+    global _engine
+    with _engine_lock:
+        if _engine is None or _engine.badges is not badges or _engine.index is not exercise_index:
+            _engine = BadgeEngine(badges, exercise_index)
+        return _engine
+
+
+if __name__ == "__main__":
+    # Full pass over every client, for operators: python badges.py (run from the app directory)
+    from services import user_store, current_badge_engine
+    print(f"Badges updated for {current_badge_engine().backfill(user_store)} client(s).")
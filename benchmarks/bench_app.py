@@ -0,0 +1,218 @@
+import argparse
+import base64
+import csv
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPO)
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# --- App data-path benchmark ---
+# Generates a synthetic data/ directory at the requested scale, times the data functions behind each tab,
+# then drives full-script reruns with AppTest for every role and tab. Results are written as JSON so two
+# commits can be compared. Each avatar mode runs in its own process because the stores are process-wide.
+# Usage: python benchmarks/bench_app.py --users 10000 --avatars both --out results.json
+
+PASSWORD = "benchmark"
+BODY_PARTS = ["legs", "arms", "core", "chest", "back", "shoulders", "full body"]
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+EQUIPMENT = ["None", "Dumbbells", "Kettlebell", "Box", "Barbell", "Resistance Band", "Mat"]
+
+
+# --- Synthetic data ---
+def _avatar(rng, kb):
+    if Image is None: return b"\xff\xd8\xff" + rng.randbytes(kb * 1024)
+    img = Image.effect_noise((128, 128), 40 + rng.randrange(40)).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=95)
+    return buf.getvalue()
+
+def generate(root, users, coaches, exercises, quotes, messages, avatars, avatar_kb=16, seed=0):
+    rng = random.Random(seed)
+    data_dir = os.path.join(root, "data")
+    os.makedirs(data_dir)
+    os.makedirs(os.path.join(root, "static"))
+    if os.path.exists(os.path.join(REPO, "landing_bg.jpg")):
+        shutil.copy(os.path.join(REPO, "landing_bg.jpg"), os.path.join(root, "static"))
+    shutil.copy(os.path.join(REPO, "badges.json"), data_dir)
+
+    from credentials import hash_password
+    password_hash = hash_password(PASSWORD)  # one hash shared by every account keeps generation fast
+
+    titles = [f"Exercise {i}" for i in range(exercises)]
+    with open(os.path.join(data_dir, "exercises.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["title", "description", "difficulty", "equipment", "body_part"])
+        for title in titles:
+            writer.writerow([title, f"Do {title.lower()} for 1 minute.", rng.choice(DIFFICULTIES),
+                             rng.choice(EQUIPMENT), rng.choice(BODY_PARTS)])
+    with open(os.path.join(data_dir, "quotes.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["text", "author", "category"])
+        for i in range(quotes): writer.writerow([f"Motivational quote number {i}.", f"Author {i % 50}", "motivation"])
+
+    today = date.today()
+    records = {}
+    for i in range(users):
+        role = "Coach" if i < coaches else "Client"
+        record = {
+            "username": f"{role.lower()}{i}", "user_id": f"user_{role.lower()}{i}", "role": role,
+            "password_hash": password_hash,
+            "completed_challenges": rng.sample(titles, min(len(titles), rng.randrange(40))),
+            "viewed_calendar": sorted({(today - timedelta(days=rng.randrange(120))).isoformat()
+                                       for _ in range(rng.randrange(60))}),
+            "earned_badges": [], "messages": [], "preferences": {},
+        }
+        if role == "Coach":
+            record["messages"] = [
+                {"content": f"Coach {i} message {m}", "author_id": record["user_id"], "categories": ["General"],
+                 "timestamp": (datetime.now() - timedelta(hours=m)).isoformat(timespec="seconds"),
+                 "replies": [{"content": "Thanks!", "author_id": "client", "timestamp": datetime.now().isoformat(timespec="seconds")}]}
+                for m in range(messages)
+            ]
+        if avatars: record["avatar"] = base64.b64encode(_avatar(rng, avatar_kb)).decode()
+        records[f"{role.lower()}{i}@bench.test"] = record
+    with open(os.path.join(data_dir, "users.json"), "w", encoding="utf-8") as f: json.dump(records, f)
+    return os.path.getsize(os.path.join(data_dir, "users.json"))
+
+
+# --- Timing ---
+def timed(fn, repeat):
+    # First call is reported separately: it includes cache fills and lazy index builds
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"first_ms": round(samples[0] * 1000, 3), "median_ms": round(statistics.median(samples) * 1000, 3),
+            "max_ms": round(max(samples) * 1000, 3), "runs": repeat}
+
+def bench_data_paths(repeat):
+    import streamlit as st
+    start = time.perf_counter()
+    import services  # opens the stores and runs the one-shot migrations
+    results = {"startup_migrations": {"first_ms": round((time.perf_counter() - start) * 1000, 3), "runs": 1}}
+    client = services.user_store.emails_by_role("Client")[0]
+    coach = services.user_store.emails_by_role("Coach")[0]
+
+    results["load_users"] = timed(services.load_users, repeat)
+    results["sign_in"] = timed(lambda: services.sign_in(client, PASSWORD), repeat)
+    counter = iter(range(10 ** 9))
+    def save():
+        st.session_state.user.completed_challenges.add(f"Bench {next(counter)}")
+        services.save_current_user(immediate=True)
+    results["save_current_user"] = timed(save, repeat)
+    results["get_user_rankings_first_page"] = timed(lambda: services.get_user_rankings(0, 10), repeat)
+    last = max(0, len(services.leaderboard) - 10)
+    results["get_user_rankings_last_page"] = timed(lambda: services.get_user_rankings(last, 10), repeat)
+    badges = services.load_badges_file()
+    results["get_client_achievements"] = timed(lambda: services.get_client_achievements(badges, coach), repeat)
+    matrix = services.get_client_achievements(badges, coach)
+    results["achievements_frame_page"] = timed(lambda: matrix.frame("badges", "client1", limit=50), repeat)
+    my_coaches = services.roster.coaches_of(client)
+    results["client_message_timeline"] = timed(lambda: services.message_store.timeline(0, 20, my_coaches), repeat)
+    results["coach_message_threads"] = timed(lambda: services.message_store.by_coach(coach, 0, 20), repeat)
+    index = services.catalog.exercise_index()
+    results["program_generator"] = timed(lambda: index.sample(5, body_part=index.body_parts[0]), repeat)
+    results["program_generator_filtered"] = timed(
+        lambda: index.sample(5, body_part=index.body_parts[0], difficulty="Hard", equipment="None"), repeat
+    )
+    return results
+
+def bench_reruns(repeat):
+    from streamlit.testing.v1 import AppTest
+    import services
+    results = {}
+    for role in ("Client", "Coach"):
+        email = services.user_store.emails_by_role(role)[0]
+        at = AppTest.from_file(os.path.join(REPO, "app.py"), default_timeout=60)
+        at.session_state.show_landing = False
+        at.run()
+        at.text_input(key="login_email").input(email)
+        at.text_input(key="login_password").input(PASSWORD)
+        next(b for b in at.button if b.label == "Sign In").click()
+        at.run()
+        at.run()
+        nav_key = f"active_tab_{role}"
+        for label in at.radio(key=nav_key).options:
+            def rerun():
+                at.radio(key=nav_key).set_value(label)
+                at.run()
+                if at.exception: raise RuntimeError([e.value for e in at.exception])
+            results[f"{role}/{label}"] = timed(rerun, repeat)
+    return results
+
+
+def run_scenario(args, avatars):
+    root = tempfile.mkdtemp(prefix="equinox-bench-")
+    cwd = os.getcwd()
+    try:
+        users_json_bytes = generate(root, args.users, args.coaches, args.exercises, args.quotes, args.messages,
+                                    avatars, args.avatar_kb, args.seed)
+        os.chdir(root)
+        result = {"avatars": avatars, "users_json_bytes": users_json_bytes, "data_paths": bench_data_paths(args.repeat)}
+        if not args.skip_reruns: result["reruns"] = bench_reruns(args.repeat)
+        return result
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--coaches", type=int, default=10)
+    parser.add_argument("--exercises", type=int, default=500)
+    parser.add_argument("--quotes", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=20, help="embedded messages per coach")
+    parser.add_argument("--avatars", choices=["none", "inline", "both"], default="both")
+    parser.add_argument("--avatar-kb", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-reruns", action="store_true", help="skip the AppTest full-script reruns")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--scenario", choices=["none", "inline"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        print(json.dumps(run_scenario(args, args.scenario == "inline")))
+        sys.exit(0)
+
+    scenarios = []
+    for mode in (["none", "inline"] if args.avatars == "both" else [args.avatars]):
+        child = subprocess.run([sys.executable, __file__, *sys.argv[1:], "--scenario", mode],
+                               capture_output=True, text=True, check=True)
+        scenarios.append(json.loads(child.stdout.strip().splitlines()[-1]))
+    results = {
+        "commit": git_commit(), "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "scenario")},
+        "scenarios": scenarios,
+    }
+    for scenario in scenarios:
+        print(f"avatars={scenario['avatars']}  users.json {scenario['users_json_bytes'] / 1e6:.1f} MB")
+        for group in ("data_paths", "reruns"):
+            for name, r in scenario.get(group, {}).items():
+                print(f"  {name:<36} first {r['first_ms']:>9.2f} ms" + (f"  median {r['median_ms']:>9.2f} ms" if "median_ms" in r else ""))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f: json.dump(results, f, indent=2)
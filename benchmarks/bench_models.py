@@ -0,0 +1,118 @@
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from models import User, Message, dumps, loads
+
+# --- Model memory / serialization benchmark ---
+# Compares the slotted User + compact encoding against the previous dict-backed User + indent=2 JSON.
+# decode_s only parses and builds the users; decode_read_s also touches every container once, which is
+# where the slotted User pays for the tracking containers it builds lazily.
+# Usage: python benchmarks/bench_models.py [--sizes 10000 100000] [--out results.json]
+
+class LegacyUser:
+    # The pre-slots layout: plain attributes in a per-instance __dict__, sets held as-is
+    def __init__(self, username, user_id):
+        self.username = username
+        self.user_id = user_id
+        self.completed_challenges = set()
+        self.viewed_calendar = set()
+        self.earned_badges = set()
+        self.messages = []
+        self.avatar = None
+        self.preferences = {}
+
+def legacy_to_dict(user):
+    return {
+        "username": user.username, "user_id": user.user_id, "role": "Client", "password_hash": "x" * 64,
+        "completed_challenges": list(user.completed_challenges),
+        "viewed_calendar": list(user.viewed_calendar),
+        "earned_badges": list(user.earned_badges),
+        "messages": [m.to_dict() for m in user.messages],
+        "avatar": user.avatar, "preferences": user.preferences,
+    }
+
+def legacy_from_dict(data):
+    user = LegacyUser(data["username"], data["user_id"])
+    user.completed_challenges = set(data.get("completed_challenges", []))
+    user.viewed_calendar = set(data.get("viewed_calendar", []))
+    user.earned_badges = set(data.get("earned_badges", []))
+    user.messages = [Message.from_dict(m) for m in data.get("messages", [])]
+    user.avatar = data.get("avatar")
+    user.preferences = data.get("preferences", {})
+    return user
+
+
+def fake_fields(rng):
+    return {
+        "completed_challenges": [f"Exercise {rng.randrange(500)}" for _ in range(rng.randrange(20))],
+        "viewed_calendar": [f"2025-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}" for _ in range(rng.randrange(30))],
+        "earned_badges": [f"Badge {rng.randrange(12)}" for _ in range(rng.randrange(4))],
+    }
+
+def build(cls, n, seed=0):
+    rng = random.Random(seed)
+    users = []
+    for i in range(n):
+        user = cls(f"user{i}", f"u{i:06d}")
+        for field, values in fake_fields(rng).items(): setattr(user, field, set(values))
+        users.append(user)
+    return users
+
+def measure_memory(cls, n):
+    gc.collect()
+    tracemalloc.start()
+    users = build(cls, n)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del users
+    return current / n
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def read_all(users):
+    # Touch every container once: the slotted User builds its tracking containers on first access
+    for u in users: len(u.completed_challenges) + len(u.viewed_calendar) + len(u.earned_badges) + len(u.messages)
+
+def run(n):
+    legacy, slotted = build(LegacyUser, n), build(User, n)
+    old_text, old_encode = timed(lambda: json.dumps({u.user_id: legacy_to_dict(u) for u in legacy}, indent=2))
+    old_users, old_decode = timed(lambda: [legacy_from_dict(d) for d in json.loads(old_text).values()])
+    _, old_read = timed(lambda: read_all(old_users))
+    new_text, new_encode = timed(lambda: dumps({u.user_id: u.to_dict("x" * 64, "Client") for u in slotted}))
+    new_users, new_decode = timed(lambda: [User.from_dict(d) for d in loads(new_text).values()])
+    _, new_read = timed(lambda: read_all(new_users))
+    legacy = slotted = old_users = new_users = None
+    return {
+        "users": n,
+        "legacy": {"bytes_per_user": round(measure_memory(LegacyUser, n)), "encoded_bytes": len(old_text),
+                   "encode_s": round(old_encode, 4), "decode_s": round(old_decode, 4),
+                   "decode_read_s": round(old_decode + old_read, 4)},
+        "slots": {"bytes_per_user": round(measure_memory(User, n)), "encoded_bytes": len(new_text),
+                  "encode_s": round(new_encode, 4), "decode_s": round(new_decode, 4),
+                  "decode_read_s": round(new_decode + new_read, 4)},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--out", help="write results as JSON to this file")
+    args = parser.parse_args()
+    results = [run(n) for n in args.sizes]
+    for r in results:
+        for name in ("legacy", "slots"):
+            s = r[name]
+            print(f"{r['users']:>7} {name:<6} {s['bytes_per_user']:>6} B/user  {s['encoded_bytes'] / 1e6:8.2f} MB  "
+                  f"encode {s['encode_s']:.3f}s  decode {s['decode_s']:.3f}s  decode+read {s['decode_read_s']:.3f}s")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f: json.dump(results, f, indent=2)
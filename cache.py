@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+
+# --- Read-through caches ---
+# Shared by every session in the process. Entries expire after `ttl` seconds so writes made by
+# other worker processes are picked up; writes made through this process invalidate immediately.
+
+_MISSING = object()
+
+class LRUCache:
+    def __init__(self, maxsize=1024, ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or (self.ttl is not None and time.monotonic() - entry[0] > self.ttl):
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None: self._data.clear()
+            else: self._data.pop(key, None)
+
+    def __len__(self): return len(self._data)
+
+
+class CachedUserStore:
+    # Wraps a user store: get() is served from memory, every write through the wrapper invalidates.
+    # Records are handed out as shallow copies so callers can set keys without corrupting the cache.
+    def __init__(self, store, maxsize=4096, ttl=30.0):
+        self.store = store
+        self.records = LRUCache(maxsize, ttl)
+        self.users = LRUCache(maxsize, ttl)  # hydrated, read-only User objects
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def get(self, email):
+        data = self.records.get(email, _MISSING)
+        if data is _MISSING:
+            data = self.store.get(email)
+            self.records.put(email, data)
+        return dict(data) if data is not None else None
+
+    def get_user(self, email, hydrate):
+        # Shared hydrated User for read-only views (names, avatars); never hand this to a session to edit
+        user = self.users.get(email)
+        if user is None:
+            data = self.get(email)
+            if data is None: return None
+            user = hydrate(data)
+            self.users.put(email, user)
+        return user
+
+    def exists(self, email):
+        return self.get(email) is not None
+
+    def invalidate(self, email=None):
+        self.records.invalidate(email)
+        self.users.invalidate(email)
+
+    def put(self, email, data, expected_version=None):
+        try:
+            return self.store.put(email, data, expected_version)
+        finally:
+            self.invalidate(email)
+
+    def put_many(self, records):
+        try:
+            return self.store.put_many(records)
+        finally:
+            for email in records: self.invalidate(email)
+
+    def save_all(self, users):
+        try:
+            return self.store.save_all(users)
+        finally:
+            self.invalidate()
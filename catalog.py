@@ -0,0 +1,221 @@
+import csv
+import io
+import os
+import random
+import re
+import threading
+from collections import defaultdict
+from storage import FileLock
+from metrics import track
+from search import CatalogSearch
+from utils import load_challenges, load_quotes, load_badges, append_csv, write_csv, CHALLENGE_FIELDS, QUOTE_FIELDS
+
+# --- Shared content catalog ---
+# Each file is parsed once per process and re-parsed only when its mtime changes.
+# The returned lists are shared by every session, so callers must copy before mutating.
+# CSV files are append-only: new rows are appended on disk and to the shared list in place.
+
+class CachedFile:
+    def __init__(self, path, loader):
+        self.path = path
+        self.loader = loader
+        self._mtime = None
+        self._data = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:  # another session may have reloaded while we waited
+                    self._data = self.loader(self.path)
+                    self._mtime = mtime
+        return self._data
+
+    @property
+    def version(self):
+        return self._mtime
+
+
+class CsvCatalogFile(CachedFile):
+    # When the file only grew (same inode, larger size), just the appended tail is parsed.
+    # Reloads take the same inter-process lock as writers, so a half-appended row is never read.
+    def __init__(self, path, loader, fieldnames):
+        super().__init__(path, loader)
+        self.fieldnames = fieldnames
+        self._size = 0
+        self._ino = None
+
+    def get(self):
+        st = os.stat(self.path)
+        if (st.st_mtime_ns, st.st_size) != (self._mtime, self._size):  # size too: mtime can be coarse
+            with self._lock, FileLock(self.path):
+                self._refresh()
+        return self._data
+
+    def _refresh(self):
+        # Caller holds self._lock and the file lock
+        st = os.stat(self.path)
+        if (st.st_mtime_ns, st.st_size) == (self._mtime, self._size): return
+        if self._data is not None and st.st_ino == self._ino and st.st_size >= self._size:
+            with track("csv.tail", bytes_read=st.st_size - self._size), open(self.path, "rb") as f:
+                f.seek(self._size)
+                tail = f.read(st.st_size - self._size)
+            text = tail.decode("utf-8")
+            if text.strip():
+                self._data.extend(csv.DictReader(io.StringIO(text, newline=""), fieldnames=self.fieldnames))
+        else:
+            self._data = self.loader(self.path)
+        self._mtime, self._size, self._ino = st.st_mtime_ns, st.st_size, st.st_ino
+
+
+# --- Exercise filter index ---
+def normalize_body_part(value): return (value or "Other").strip().capitalize()
+def normalize_difficulty(value): return (value or "").strip()
+def title_key(value): return (value or "").strip().lower()
+def split_equipment(value):
+    # equipment cells may list several items ("Dumbbells,Box"); Challenge uses ";" for the same thing
+    return [e.strip().title() for e in re.split(r"[,;]", value or "") if e.strip()] or ["None"]
+
+class ExerciseIndex:
+    # Maps every (body_part, difficulty, equipment) combination, with None as the "All" wildcard,
+    # to the ids (row positions) of matching exercises, so a filtered query is one dict lookup.
+    def __init__(self, exercises):
+        self.exercises = exercises
+        self.size = 0
+        self._ids = defaultdict(list)
+        self._body_part_by_title = {}
+        self._by_title = {}
+        self._title_keys = set()
+        self._difficulties = defaultdict(set)
+        self._equipment = defaultdict(set)
+        self.body_parts = []
+        self.sync()
+
+    def sync(self):
+        # Index rows appended to the shared exercise list since the last call
+        new_parts = set()
+        for ex_id in range(self.size, len(self.exercises)):
+            ex = self.exercises[ex_id]
+            bp, diff = normalize_body_part(ex.get("body_part")), normalize_difficulty(ex.get("difficulty"))
+            self._body_part_by_title[ex.get("title")] = bp
+            self._by_title[ex.get("title")] = ex
+            self._title_keys.add(title_key(ex.get("title")))
+            new_parts.add(bp)
+            for eq in {None, *split_equipment(ex.get("equipment"))}:
+                for key in {(bp, diff, eq), (bp, None, eq), (None, diff, eq), (None, None, eq)}:
+                    self._ids[key].append(ex_id)
+                    if key[1] is not None and key[2] is None: self._difficulties[key[0]].add(key[1])
+                    if key[2] is not None and key[1] is None: self._equipment[key[0]].add(key[2])
+            self.size = ex_id + 1
+        if not new_parts <= set(self.body_parts):
+            self.body_parts = sorted(set(self.body_parts) | new_parts)
+
+    def body_part_of(self, title): return self._body_part_by_title.get(title)
+    def by_title(self, title): return self._by_title.get(title)
+    def has_title(self, title): return title_key(title) in self._title_keys
+    def difficulties(self, body_part=None): return sorted(self._difficulties[body_part])
+    def equipment(self, body_part=None): return sorted(self._equipment[body_part])
+
+    def query(self, body_part=None, difficulty=None, equipment=None):
+        return self._ids.get((body_part, difficulty, equipment), [])
+
+    def count(self, **filters): return len(self.query(**filters))
+
+    def sample(self, k, rng=random, **filters):
+        ids = self.query(**filters)
+        return [self.exercises[i] for i in rng.sample(ids, min(k, len(ids)))]
+
+
+class Catalog:
+    COMPACT_EVERY = 200  # appended rows between background compactions
+
+    def __init__(self, challenges_file, quotes_file, badges_file):
+        self.challenges_file = CsvCatalogFile(challenges_file, load_challenges, CHALLENGE_FIELDS)
+        self.quotes_file = CsvCatalogFile(quotes_file, load_quotes, QUOTE_FIELDS)
+        self.badges_file = CachedFile(badges_file, load_badges)
+        self._index = None
+        self._index_lock = threading.Lock()
+        self._appended = 0
+        self._compacting = None
+        self.search_index = CatalogSearch()
+
+    def challenges(self): return self.challenges_file.get()
+    def quotes(self): return self.quotes_file.get()
+    def badges(self): return self.badges_file.get()
+
+    def exercise_index(self):
+        return self._index_for(self.challenges())
+
+    def _index_for(self, exercises):
+        # Rebuilt when exercises.csv was replaced; appended rows are folded in incrementally
+        index = self._index
+        if index is None or index.exercises is not exercises or index.size != len(exercises):
+            with self._index_lock:
+                if self._index is None or self._index.exercises is not exercises:
+                    self._index = ExerciseIndex(exercises)
+                elif self._index.size != len(exercises):
+                    self._index.sync()
+                index = self._index
+        return index
+
+    def search(self, text, kind="exercise", limit=20):
+        # Ranked full-text search over exercises or quotes: [(row, score)], best first
+        self.search_index.sync(kind, self.challenges() if kind == "exercise" else self.quotes())
+        return self.search_index.search(text, kind, limit)
+
+    # --- Catalog writes ---
+    def add_exercises(self, rows):
+        # Appends exercises whose title is not in the catalog yet (case-insensitive, also within `rows`).
+        # Returns (added_rows, skipped_rows).
+        cached = self.challenges_file
+        with cached._lock, FileLock(cached.path):
+            cached._refresh()  # pick up rows other workers appended before checking for duplicates
+            index = self._index_for(cached._data)  # not exercise_index(): get() would take cached._lock again
+            seen, added, skipped = set(), [], []
+            for row in rows:
+                key = title_key(row.get("title"))
+                if not key or key in seen or index.has_title(key):
+                    skipped.append(row)
+                else:
+                    seen.add(key)
+                    added.append({f: (row.get(f) or "").strip() for f in CHALLENGE_FIELDS})
+            if added:
+                append_csv(cached.path, CHALLENGE_FIELDS, added)
+                cached._refresh()  # parses just the rows we wrote
+        self.exercise_index()
+        if added: self.search_index.sync("exercise", cached._data)  # indexes just the appended rows
+        self._appended += len(added)
+        if self._appended >= self.COMPACT_EVERY: self.compact_async()
+        return added, skipped
+
+    def compact(self):
+        # Rewrites exercises.csv without duplicate or blank titles; the rename makes readers reload once
+        cached = self.challenges_file
+        with cached._lock, FileLock(cached.path):
+            rows, seen = [], set()
+            for row in load_challenges(cached.path):
+                key = title_key(row.get("title"))
+                if key and key not in seen:
+                    seen.add(key)
+                    rows.append(row)
+            write_csv(cached.path, CHALLENGE_FIELDS, rows)
+            cached._refresh()
+        self._appended = 0
+
+    def compact_async(self):
+        if self._compacting is None or not self._compacting.is_alive():
+            self._compacting = threading.Thread(target=self.compact, name="catalog-compact", daemon=True)
+            self._compacting.start()
+        return self._compacting
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def get_catalog(challenges_file, quotes_file, badges_file):
+    key = (challenges_file, quotes_file, badges_file)
+    with _catalogs_lock:
+        if key not in _catalogs:
+            _catalogs[key] = Catalog(*key)
+        return _catalogs[key]
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+# --- Coach analytics ---
+# Builds clients x badges and clients x exercises boolean matrices in one pass over the client rows,
+# then filters, sorts and pages them as DataFrames that st.dataframe can render directly.
+
+def _bool_matrix(rows_items, columns):
+    # rows_items: one iterable of column labels per client; unknown labels are ignored
+    pos = {c: i for i, c in enumerate(columns)}
+    counts, cols = [], []
+    for items in rows_items:
+        hits = [pos[x] for x in items if x in pos]
+        counts.append(len(hits))
+        cols.extend(hits)
+    matrix = np.zeros((len(counts), len(columns)), dtype=bool)
+    if cols:
+        matrix[np.repeat(np.arange(len(counts)), counts), np.asarray(cols)] = True
+    return matrix
+
+
+class AchievementsMatrix:
+    def __init__(self, client_rows, badge_names, exercise_titles):
+        # client_rows: [(email, username, earned_badges, completed_challenges), ...]
+        self.emails = np.array([r[0] for r in client_rows], dtype=object)
+        self.clients = np.array([r[1] for r in client_rows], dtype=object)
+        self.badge_names = list(badge_names)
+        self.exercise_titles = list(exercise_titles)
+        self.badges = _bool_matrix((r[2] for r in client_rows), self.badge_names)
+        self.exercises = _bool_matrix((r[3] for r in client_rows), self.exercise_titles)
+
+    def __len__(self): return len(self.clients)
+
+    def frame(self, kind="badges", search=None, require=None, sort_by=None, ascending=False, offset=0, limit=50):
+        # require: column names every returned client must have; sort_by: "Client", "Total" or a column name
+        matrix, columns = (self.badges, self.badge_names) if kind == "badges" else (self.exercises, self.exercise_titles)
+        mask = np.ones(len(self.clients), dtype=bool)
+        if search:
+            mask &= pd.Series(self.clients).str.contains(search, case=False, regex=False).to_numpy()
+        for col in require or ():
+            if col in columns: mask &= matrix[:, columns.index(col)]
+        idx = np.flatnonzero(mask)
+        totals = matrix[idx].sum(axis=1)
+        if sort_by == "Client":
+            order = np.argsort(self.clients[idx].astype(str), kind="stable")
+        elif sort_by in columns:
+            order = np.argsort(matrix[idx, columns.index(sort_by)], kind="stable")
+        else:
+            order = np.argsort(totals, kind="stable")
+        if not ascending: order = order[::-1]
+        page = order[offset:offset + limit]
+        df = pd.DataFrame(matrix[idx[page]], columns=columns)
+        df.insert(0, "Total", totals[page])
+        df.insert(0, "Client", self.clients[idx[page]])
+        return df, len(idx)
+
+
+def build_achievements_matrix(user_store, badges, exercises, client_emails=None):
+    rows = user_store.client_fields("earned_badges", "completed_challenges", emails=client_emails)
+    return AchievementsMatrix(rows, [b["name"] for b in badges], list(dict.fromkeys(e["title"] for e in exercises)))
@@ -0,0 +1,105 @@
+import base64
+import hashlib
+import hmac
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+# --- Password hashing ---
+# Hashes are stored as "scrypt$<n>$<r>$<p>$<salt>$<hash>" (salt and hash base64).
+# Old accounts hold a bare unsalted SHA-256 hex digest; those still verify and are flagged for rehash.
+SCRYPT_R = 8
+SCRYPT_P = 1
+DEFAULT_N = 2 ** 14  # ~16 MB and tens of ms per hash on typical hardware
+_LEGACY_RE = re.compile(r"^[0-9a-f]{64}$")
+
+class CredentialsBusy(Exception):
+    pass
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * r * n, dklen=32)
+
+def hash_password(password, n=None):
+    n = n or current_cost()
+    salt = os.urandom(16)
+    digest = _scrypt(password, salt, n, SCRYPT_R, SCRYPT_P)
+    return "$".join(["scrypt", str(n), str(SCRYPT_R), str(SCRYPT_P),
+                     base64.b64encode(salt).decode(), base64.b64encode(digest).decode()])
+
+def verify_password(password, stored):
+    # Returns (ok, new_hash): new_hash is set when the stored hash is legacy or cheaper than the current cost
+    if not stored: return False, None
+    if _LEGACY_RE.match(stored):
+        ok = hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+        return ok, (hash_password(password) if ok else None)
+    try:
+        scheme, n, r, p, salt, digest = stored.split("$")
+        n, r, p = int(n), int(r), int(p)
+    except ValueError:
+        return False, None
+    if scheme != "scrypt": return False, None
+    ok = hmac.compare_digest(_scrypt(password, base64.b64decode(salt), n, r, p), base64.b64decode(digest))
+    return ok, (hash_password(password) if ok and n < current_cost() else None)
+
+
+# --- Cost calibration ---
+_cost = None
+
+def calibrate(target_ms=100, min_n=2 ** 12, max_n=2 ** 17):
+    # Largest power-of-two n whose hash time stays within target_ms on this machine
+    n = min_n
+    while n < max_n:
+        start = time.perf_counter()
+        _scrypt("calibration", b"0" * 16, n * 2, SCRYPT_R, SCRYPT_P)
+        if (time.perf_counter() - start) * 1000 > target_ms: break
+        n *= 2
+    return n
+
+def current_cost():
+    # EQUINOX_SCRYPT_N pins the cost; "auto" benchmarks once per process
+    global _cost
+    if _cost is None:
+        setting = os.environ.get("EQUINOX_SCRYPT_N", str(DEFAULT_N))
+        _cost = calibrate() if setting == "auto" else int(setting)
+    return _cost
+
+
+# --- Bounded verification pool ---
+class CredentialPool:
+    # scrypt releases the GIL, so a few worker threads hash in parallel while sessions wait on their own
+    # result; max_pending caps the queue so a login storm is rejected instead of stalling every session.
+    def __init__(self, max_workers=None, max_pending=32):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or min(4, os.cpu_count() or 1),
+                                           thread_name_prefix="credentials")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _run(self, fn, *args, timeout=10):
+        if not self._slots.acquire(timeout=timeout):
+            raise CredentialsBusy("Too many sign-in attempts in progress, please try again.")
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the job has run or been cancelled, so abandoned jobs still count
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=timeout)
+        except FuturesTimeout:
+            future.cancel()  # drops it if still queued; a job already hashing finishes and frees its slot
+            raise CredentialsBusy("Sign-in is taking too long, please try again.") from None
+
+    def verify(self, password, stored, timeout=10): return self._run(verify_password, password, stored, timeout=timeout)
+    def hash(self, password, timeout=10): return self._run(hash_password, password, timeout=timeout)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_credential_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None: _pool = CredentialPool()
+        return _pool
@@ -0,0 +1,87 @@
+import bisect
+import threading
+import time
+
+# --- Maintained client leaderboard ---
+# Entries are kept sorted as (-score, email) so the best scores come first and ties break by email.
+# The index is seeded from the user store and updated in place on every save made by this process. Other
+# worker processes save through their own boards, so it is re-seeded from the store every `ttl` seconds.
+
+class Leaderboard:
+    def __init__(self, entries=(), source=None, ttl=30.0):
+        self.source = source  # user store to re-seed from; None keeps the initial entries forever
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._reseed_lock = threading.Lock()
+        self._recent = {}  # email -> (score, username, time) of updates made by this process
+        self._seeded_at = time.monotonic()
+        self._load({email: (score, username) for email, username, score in entries})
+
+    def _load(self, entries):
+        self._entries = entries  # email -> (score, username)
+        self._keys = sorted((-score, email) for email, (score, _) in entries.items())
+
+    def _maybe_reseed(self):
+        if self.source is None or time.monotonic() - self._seeded_at < self.ttl: return
+        if not self._reseed_lock.acquire(blocking=False): return  # another session is already re-seeding
+        try:
+            started = time.monotonic()
+            entries = {email: (score, username) for email, username, score in self.source.client_scores()}
+            with self._lock:
+                # Saves still waiting in the write-behind queue are not in the store yet, so local updates
+                # since the previous seed win over what was just read
+                self._recent = {e: r for e, r in self._recent.items() if r[2] >= self._seeded_at}
+                for email, (score, username, _) in self._recent.items(): entries[email] = (score, username)
+                self._load(entries)
+                self._seeded_at = started
+        finally:
+            self._reseed_lock.release()
+
+    def __len__(self):
+        self._maybe_reseed()
+        return len(self._keys)
+
+    def update(self, email, username, score):
+        with self._lock:
+            old = self._entries.get(email)
+            if old is not None:
+                if old == (score, username): return
+                del self._keys[bisect.bisect_left(self._keys, (-old[0], email))]
+            self._entries[email] = (score, username)
+            self._recent[email] = (score, username, time.monotonic())
+            bisect.insort(self._keys, (-score, email))
+
+    def remove(self, email):
+        with self._lock:
+            old = self._entries.pop(email, None)
+            self._recent.pop(email, None)
+            if old is not None:
+                del self._keys[bisect.bisect_left(self._keys, (-old[0], email))]
+
+    def rank(self, email):
+        # Competition ranking: tied scores share the better rank
+        self._maybe_reseed()
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None: return None
+            return bisect.bisect_left(self._keys, (-entry[0],)) + 1
+
+    def page(self, offset=0, limit=10):
+        self._maybe_reseed()
+        with self._lock:
+            keys = self._keys[offset:offset + limit]
+            return [
+                {"email": email, "username": self._entries[email][1], "completed": -neg_score}
+                for neg_score, email in keys
+            ]
+
+
+_boards = {}
+_boards_lock = threading.Lock()
+
+def get_leaderboard(user_store):
+    with _boards_lock:
+        key = id(user_store)
+        if key not in _boards:
+            _boards[key] = Leaderboard(user_store.client_scores(), source=user_store)
+        return _boards[key]
@@ -0,0 +1,278 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from cache import LRUCache
+from models import Message
+from search import fts_query
+from storage import SqliteStore, FileLock
+
+# --- Coach message board store ---
+# Messages get a stable integer id; the timestamp index backs the client timeline.
+# Replies are an append-only log per message id: posting one is an insert plus a reply_count bump, and
+# threads are read newest-first in pages keyed by reply id, so thread length never affects the board.
+# Hydrated Message objects (with the latest REPLY_PREVIEW replies) are cached by id and dropped
+# whenever that message or its replies change.
+REPLY_PREVIEW = 3
+
+class MessageStore(SqliteStore):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            coach_email TEXT NOT NULL,
+            author_id TEXT NOT NULL,
+            content TEXT NOT NULL,
+            categories TEXT NOT NULL DEFAULT '[]',
+            timestamp TEXT NOT NULL,
+            reply_count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_timeline ON messages(timestamp DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS idx_messages_coach ON messages(coach_email, timestamp DESC);
+        CREATE TABLE IF NOT EXISTS replies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message_id INTEGER NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+            content TEXT NOT NULL,
+            author_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_replies_message ON replies(message_id, id);
+        -- Full-text index over message and reply text, kept in step by triggers (reply_id NULL = the message)
+        CREATE VIRTUAL TABLE IF NOT EXISTS message_search USING fts5(
+            content, message_id UNINDEXED, reply_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        );
+        CREATE TRIGGER IF NOT EXISTS messages_search_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO message_search (content, message_id, reply_id) VALUES (new.content, new.id, NULL);
+        END;
+        CREATE TRIGGER IF NOT EXISTS replies_search_insert AFTER INSERT ON replies BEGIN
+            INSERT INTO message_search (content, message_id, reply_id) VALUES (new.content, new.message_id, new.id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS messages_search_delete AFTER DELETE ON messages BEGIN
+            DELETE FROM message_search WHERE message_id = old.id;
+        END;
+        CREATE TABLE IF NOT EXISTS message_meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.cache = LRUCache(maxsize=2048)
+
+    def migrate(self):
+        if self._ensure_column("messages", "reply_count", "INTEGER NOT NULL DEFAULT 0"):
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE messages SET reply_count = (SELECT COUNT(*) FROM replies r WHERE r.message_id = messages.id)"
+                )
+        # Messages stored before the search index existed are indexed once
+        if self.conn.execute("SELECT 1 FROM message_search LIMIT 1").fetchone() is None:
+            with self.conn:
+                self.conn.execute("INSERT INTO message_search (content, message_id, reply_id) SELECT content, id, NULL FROM messages")
+                self.conn.execute("INSERT INTO message_search (content, message_id, reply_id) SELECT content, message_id, id FROM replies")
+
+    def post(self, coach_email, message):
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO messages (coach_email, author_id, content, categories, timestamp) VALUES (?, ?, ?, ?, ?)",
+                (coach_email, message.author_id, message.content, json.dumps(sorted(message.categories)), message.timestamp),
+            )
+            message.message_id = cur.lastrowid
+            for reply in message.replies:
+                self._insert_reply(message.message_id, reply)
+        return message.message_id
+
+    def delete(self, message_id):
+        with self.conn:
+            self.conn.execute("DELETE FROM replies WHERE message_id = ?", (message_id,))
+            self.conn.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+        self.cache.invalidate(message_id)
+
+    def add_reply(self, message_id, reply):
+        with self.conn:
+            reply_id = self._insert_reply(message_id, reply)
+        self.cache.invalidate(message_id)
+        return reply_id
+
+    def _insert_reply(self, message_id, reply):
+        reply_id = self.conn.execute(
+            "INSERT INTO replies (message_id, content, author_id, timestamp) VALUES (?, ?, ?, ?)",
+            (message_id, reply["content"], reply["author_id"], reply["timestamp"]),
+        ).lastrowid
+        self.conn.execute("UPDATE messages SET reply_count = reply_count + 1 WHERE id = ?", (message_id,))
+        return reply_id
+
+    def replies(self, message_id, limit=20, before_id=None):
+        # One page of a thread, oldest first, ending just before reply `before_id` (None = the newest).
+        # Returns (replies, cursor); pass cursor back as before_id for the previous page, None when done.
+        rows = self.conn.execute(
+            "SELECT id, content, author_id, timestamp FROM replies WHERE message_id = ? AND id < ? "
+            "ORDER BY id DESC LIMIT ?", (message_id, before_id if before_id is not None else 2 ** 63 - 1, limit + 1),
+        ).fetchall()
+        page = [_reply(*r) for r in reversed(rows[:limit])]
+        return page, (page[0]["id"] if len(rows) > limit else None)
+
+    def latest_replies(self, message_ids, limit=REPLY_PREVIEW):
+        # {message_id: [last `limit` replies, oldest first]} in one indexed query
+        if not message_ids: return {}
+        latest = {mid: [] for mid in message_ids}
+        for message_id, reply_id, content, author_id, timestamp in self.conn.execute(
+            f"SELECT message_id, id, content, author_id, timestamp FROM ("
+            f"  SELECT *, ROW_NUMBER() OVER (PARTITION BY message_id ORDER BY id DESC) AS n FROM replies"
+            f"  WHERE message_id IN ({','.join('?' * len(message_ids))})"
+            f") WHERE n <= ? ORDER BY id", list(message_ids) + [limit],
+        ):
+            latest[message_id].append(_reply(reply_id, content, author_id, timestamp))
+        return latest
+
+    def timeline(self, offset=0, limit=20, coach_emails=None):
+        # Newest first; returns [(coach_email, Message), ...]
+        if coach_emails is not None and not coach_emails: return []
+        sql = "SELECT id FROM messages"  # ids only; bodies come from the cache when possible
+        params = []
+        if coach_emails is not None:
+            sql += f" WHERE coach_email IN ({','.join('?' * len(coach_emails))})"
+            params += list(coach_emails)
+        sql += " ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?"
+        return self.get_many([r[0] for r in self.conn.execute(sql, params + [limit, offset])])
+
+    def by_coach(self, coach_email, offset=0, limit=20):
+        return [m for _, m in self.timeline(offset, limit, [coach_email])]
+
+    def count(self, coach_emails=None):
+        if coach_emails is None:
+            return self.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        if not coach_emails: return 0
+        return self.conn.execute(
+            f"SELECT COUNT(*) FROM messages WHERE coach_email IN ({','.join('?' * len(coach_emails))})",
+            list(coach_emails),
+        ).fetchone()[0]
+
+    def search(self, text, coach_emails=None, limit=20):
+        # Messages whose text or replies match, best bm25 match first: [(coach_email, Message)]
+        query = fts_query(text)
+        if not query or (coach_emails is not None and not coach_emails): return []
+        sql, params = "SELECT message_id FROM message_search WHERE message_search MATCH ?", [query]
+        if coach_emails is not None:
+            sql += f" AND message_id IN (SELECT id FROM messages WHERE coach_email IN ({','.join('?' * len(coach_emails))}))"
+            params += list(coach_emails)
+        message_ids = []
+        try:
+            for (mid,) in self.conn.execute(sql + " ORDER BY rank", params):
+                if mid not in message_ids: message_ids.append(mid)  # a message and its replies count once
+                if len(message_ids) == limit: break
+        except sqlite3.OperationalError:
+            return []
+        return self.get_many(message_ids)
+
+    def get_many(self, message_ids):
+        # [(coach_email, Message)] in the given order, loading only the ids missing from the cache
+        found = {mid: self.cache.get(mid) for mid in message_ids}
+        missing = [mid for mid, hit in found.items() if hit is None]
+        if missing:
+            rows = self.conn.execute(
+                f"SELECT id, coach_email, author_id, content, categories, timestamp, reply_count FROM messages "
+                f"WHERE id IN ({','.join('?' * len(missing))})", missing,
+            ).fetchall()
+            for entry in self._hydrate(rows):
+                found[entry[1].message_id] = entry
+                self.cache.put(entry[1].message_id, entry)
+        return [found[mid] for mid in message_ids if found[mid] is not None]
+
+    def iter_records(self, coach_emails=None, batch_size=500):
+        # Every message with its replies as plain dicts, oldest first, read in id-ordered batches
+        where, params = "", []
+        if coach_emails is not None:
+            if not coach_emails: return
+            where, params = f" AND coach_email IN ({','.join('?' * len(coach_emails))})", list(coach_emails)
+        last_id = 0
+        while True:
+            rows = self.conn.execute(
+                f"SELECT id, coach_email, author_id, content, categories, timestamp, reply_count FROM messages "
+                f"WHERE id > ?{where} ORDER BY id LIMIT ?", [last_id] + params + [batch_size],
+            ).fetchall()
+            if not rows: return
+            for coach_email, message in self._hydrate(rows, all_replies=True):
+                yield dict(message.to_dict(), coach_email=coach_email)
+            last_id = rows[-1][0]
+
+    def restore(self, record):
+        # Inverse of iter_records. A message already there (same coach, timestamp and content) is skipped, so
+        # importing a file twice is a no-op; the original id is kept unless a different message now holds it.
+        categories = json.dumps(sorted(record.get("categories", [])))
+        with self.conn:
+            if self.conn.execute(
+                "SELECT 1 FROM messages WHERE coach_email = ? AND timestamp = ? AND content = ?",
+                (record["coach_email"], record["timestamp"], record["content"]),
+            ).fetchone(): return False
+            message_id = record.get("id")
+            if message_id is not None and self.conn.execute("SELECT 1 FROM messages WHERE id = ?", (message_id,)).fetchone():
+                message_id = None
+            message_id = self.conn.execute(
+                "INSERT INTO messages (id, coach_email, author_id, content, categories, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                (message_id, record["coach_email"], record["author_id"], record["content"], categories, record["timestamp"]),
+            ).lastrowid
+            for reply in record.get("replies", []):
+                self._insert_reply(message_id, reply)
+        self.cache.invalidate(message_id)
+        return True
+
+    def is_migrated(self):
+        return self.conn.execute("SELECT 1 FROM message_meta WHERE key = 'user_messages_moved'").fetchone() is not None
+
+    def mark_migrated(self):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO message_meta (key, value) VALUES ('user_messages_moved', ?)",
+                              (datetime.now().isoformat(timespec="seconds"),))
+
+    def _hydrate(self, rows, all_replies=False):
+        # rows: (id, coach_email, author_id, content, categories, timestamp, reply_count)
+        if not rows: return []
+        ids = [r[0] for r in rows]
+        if all_replies:
+            replies = {i: [] for i in ids}
+            for message_id, reply_id, content, author_id, timestamp in self.conn.execute(
+                f"SELECT message_id, id, content, author_id, timestamp FROM replies "
+                f"WHERE message_id IN ({','.join('?' * len(ids))}) ORDER BY id", ids,
+            ):
+                replies[message_id].append(_reply(reply_id, content, author_id, timestamp))
+        else:
+            replies = self.latest_replies(ids)
+        return [
+            (coach_email, Message(content, author_id, json.loads(categories), timestamp, replies[mid],
+                                  message_id=mid, reply_count=reply_count))
+            for mid, coach_email, author_id, content, categories, timestamp, reply_count in rows
+        ]
+
+
+def _reply(reply_id, content, author_id, timestamp):
+    return {"id": reply_id, "content": content, "author_id": author_id, "timestamp": timestamp}
+
+
+def migrate_user_messages(user_store, message_store, batch_size=500):
+    # One-shot, like seed_roster: move messages embedded in user records into the store, then drop them from
+    # the records. The marker skips the scan on later starts; the lock stops workers that start together
+    # from both moving (and so duplicating) the same messages.
+    if message_store.is_migrated(): return 0
+    with FileLock(message_store.path, timeout=300):
+        if message_store.is_migrated(): return 0
+        moved, total = {}, 0
+        for email, data in user_store.iter_records():
+            if data.get("messages"):
+                for m in data["messages"]:
+                    message_store.post(email, Message.from_dict(m))
+                data["messages"] = []
+                moved[email] = data
+            if len(moved) >= batch_size:
+                user_store.put_many(moved)
+                total, moved = total + len(moved), {}
+        if moved: user_store.put_many(moved)
+        message_store.mark_migrated()
+        return total + len(moved)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_message_store(db_path, user_store=None):
+    with _stores_lock:
+        if db_path not in _stores:
+            _stores[db_path] = MessageStore(db_path)
+            if user_store is not None: migrate_user_messages(user_store, _stores[db_path])
+        return _stores[db_path]
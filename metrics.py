@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# --- Hot-path instrumentation ---
+# Each tracked operation adds its call count, wall time and bytes read/written to the process totals and,
+# when the calling thread is running a Streamlit rerun, to that rerun's and that session's totals.
+# Work done on background threads (write-behind saves, catalog compaction) only reaches the process totals.
+#
+# EQUINOX_METRICS_FILE=<path>  rewrite a Prometheus text-format file at most every METRICS_FILE_INTERVAL s
+# EQUINOX_METRICS_LOG=1        log one JSON line per completed rerun to the "equinox.metrics" logger
+# EQUINOX_DEBUG_PANEL=1        show the performance panel in the coach sidebar
+METRICS_FILE = os.environ.get("EQUINOX_METRICS_FILE")
+METRICS_LOG = os.environ.get("EQUINOX_METRICS_LOG") == "1"
+DEBUG_PANEL = os.environ.get("EQUINOX_DEBUG_PANEL") == "1"
+METRICS_FILE_INTERVAL = 10.0
+
+log = logging.getLogger("equinox.metrics")
+
+class Stats:
+    def __init__(self):
+        self.ops = {}  # name -> [calls, seconds, bytes_read, bytes_written]
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, bytes_read=0, bytes_written=0):
+        with self._lock:
+            op = self.ops.setdefault(name, [0, 0.0, 0, 0])
+            op[0] += 1
+            op[1] += seconds
+            op[2] += bytes_read
+            op[3] += bytes_written
+
+    def rows(self):
+        # Slowest first, for tables and logs
+        with self._lock:
+            items = sorted(self.ops.items(), key=lambda kv: -kv[1][1])
+        return [{"op": name, "calls": calls, "ms": round(seconds * 1000, 3), "bytes_read": read, "bytes_written": written}
+                for name, (calls, seconds, read, written) in items]
+
+
+class Span:
+    # Handed out by track(); callers that only learn the byte counts while working add them here
+    __slots__ = ("bytes_read", "bytes_written")
+
+    def __init__(self, bytes_read=0, bytes_written=0):
+        self.bytes_read = bytes_read
+        self.bytes_written = bytes_written
+
+
+class SessionMetrics:
+    # Lives in st.session_state; totals keep growing for the whole session
+    def __init__(self):
+        self.totals = Stats()
+        self.reruns = 0
+        self.last_rerun = None  # (seconds, Stats) of the last rerun that ran to the end of the script
+
+
+process = Stats()
+_local = threading.local()
+
+def record(name, seconds, bytes_read=0, bytes_written=0):
+    process.add(name, seconds, bytes_read, bytes_written)
+    rerun, session = getattr(_local, "rerun", None), getattr(_local, "session", None)
+    if rerun is not None: rerun.add(name, seconds, bytes_read, bytes_written)
+    if session is not None: session.totals.add(name, seconds, bytes_read, bytes_written)
+
+@contextmanager
+def track(name, bytes_read=0, bytes_written=0):
+    span = Span(bytes_read, bytes_written)
+    start = time.perf_counter()
+    try:
+        yield span
+    finally:
+        record(name, time.perf_counter() - start, span.bytes_read, span.bytes_written)
+
+def instrumented(name):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with track(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- Rerun scope ---
+def begin_rerun(session):
+    # A rerun cut short by st.stop()/st.rerun() never reaches end_rerun; its work still counts for the session
+    _local.session = session
+    _local.rerun = Stats()
+    _local.rerun_start = time.perf_counter()
+
+def end_rerun():
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None: return
+    seconds = time.perf_counter() - _local.rerun_start
+    _local.rerun = None
+    session = _local.session
+    session.reruns += 1
+    session.last_rerun = (seconds, rerun)
+    record("rerun", seconds)
+    if METRICS_LOG:
+        log.info(json.dumps({"event": "rerun", "ms": round(seconds * 1000, 3), "ops": rerun.rows()}))
+    if METRICS_FILE: write_prometheus(METRICS_FILE)
+
+
+# --- Export ---
+_last_write = 0.0
+_write_lock = threading.Lock()
+
+def prometheus_text(stats=None):
+    stats = stats or process
+    series = [
+        ("equinox_op_calls_total", "Tracked operation calls", 0, "{:d}"),
+        ("equinox_op_seconds_total", "Wall time spent in tracked operations", 1, "{:.6f}"),
+        ("equinox_op_bytes_read_total", "Bytes read by tracked operations", 2, "{:d}"),
+        ("equinox_op_bytes_written_total", "Bytes written by tracked operations", 3, "{:d}"),
+    ]
+    with stats._lock:
+        ops = sorted((name, list(values)) for name, values in stats.ops.items())
+    lines = []
+    for metric, help_text, i, fmt in series:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        lines += [f'{metric}{{op="{name}"}} {fmt.format(values[i])}' for name, values in ops]
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path, force=False):
+    global _last_write
+    with _write_lock:
+        if not force and time.monotonic() - _last_write < METRICS_FILE_INTERVAL: return False
+        _last_write = time.monotonic()
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f: f.write(prometheus_text())
+        os.replace(tmp, path)  # textfile collectors must never see a partial file
+        return True
@@ -1,26 +1,186 @@
 import datetime
+import json
+from activity import ActivityLog
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# --- Record encoding ---
+# Stored user records carry a "schema" number naming the layout they were written with. Schema 1 (no key)
+# and 2 differ only in list order, so from_dict reads both the same way; records are not rewritten on read.
+# Encoding is compact (no indentation); orjson is used when installed.
+SCHEMA_VERSION = 2
+
+def dumps(data):
+    if orjson is not None: return orjson.dumps(data).decode()
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+def loads(text):
+    if orjson is not None: return orjson.loads(text)
+    return json.loads(text)
+
+# --- Dirty tracking ---
+# Containers that flag their owning User as modified, so unchanged users are never written back.
+class TrackedSet(set):
+    __slots__ = ("_owner", "_field")
+
+    def __init__(self, items=(), owner=None, field=None):
+        super().__init__(items)
+        self._owner = owner
+        self._field = field
+
+    def _wrap(name, size_check=True):
+        method = getattr(set, name)
+        def tracked(self, *args):
+            before = len(self)
+            result = method(self, *args)
+            if self._owner is not None and (not size_check or len(self) != before):
+                self._owner._touch(self._field)
+            return result
+        tracked.__name__ = name
+        return tracked
+
+    for _name in ("add", "discard", "remove", "pop", "clear", "update", "difference_update",
+                  "intersection_update", "__ior__", "__iand__", "__isub__"):
+        locals()[_name] = _wrap(_name)
+    # symmetric difference can swap elements without changing the size
+    symmetric_difference_update = _wrap("symmetric_difference_update", size_check=False)
+    __ixor__ = _wrap("__ixor__", size_check=False)
+    del _wrap, _name
+
+class TrackedList(list):
+    __slots__ = ("_owner",)
+
+    def __init__(self, items=(), owner=None):
+        super().__init__(items)
+        self._owner = owner
+
+    def _wrap(name):
+        method = getattr(list, name)
+        def tracked(self, *args):
+            result = method(self, *args)
+            if self._owner is not None: self._owner._dirty = True
+            return result
+        tracked.__name__ = name
+        return tracked
+
+    for _name in ("append", "extend", "insert", "pop", "remove", "clear", "sort", "reverse",
+                  "__setitem__", "__delitem__", "__iadd__"):
+        locals()[_name] = _wrap(_name)
+    del _wrap, _name
+
+def _tracked(field, wrap, decode):
+    # Property over the "_<field>" slot. from_dict stores the decoded list as-is and the tracking container
+    # is only built on first access, so loading users that are barely read stays cheap.
+    slot = "_" + field
+    def get(self):
+        value = getattr(self, slot)
+        if type(value) is list:
+            value = decode(self, value)
+            object.__setattr__(self, slot, value)
+        return value
+    def set_(self, value):
+        object.__setattr__(self, slot, wrap(self, value))
+    return property(get, set_)
 
 class User:
+    __slots__ = ("_dirty", "_version", "_activity", "username", "user_id", "_completed_challenges",
+                 "_viewed_calendar", "_earned_badges", "_messages", "avatar", "preferences")
+    _TRACKED_SETS = ("completed_challenges", "viewed_calendar", "earned_badges")
+
+    for _field in _TRACKED_SETS:
+        locals()[_field] = _tracked(_field, lambda self, v, f=_field: TrackedSet(v, self, f),
+                                    lambda self, v, f=_field: TrackedSet(v, self, f))
+    messages = _tracked("messages", lambda self, v: TrackedList(v, self),
+                        lambda self, v: TrackedList([Message.from_dict(m) for m in v], self))
+    del _field
+
     def __init__(self, username, user_id):
+        self._dirty = True
+        self._version = None  # store version this object was loaded at, for optimistic writes
+        self._activity = None
         self.username = username
         self.user_id = user_id
         self.completed_challenges = set()
         self.viewed_calendar = set()
         self.earned_badges = set()
         self.messages = []
+        self.avatar = None  # avatar store reference (content hash)
+        self.preferences = {}
+
+    def __setattr__(self, name, value):
+        # Public attribute assignment marks the user modified; the container properties wrap new values
+        # so in-place edits are tracked too
+        object.__setattr__(self, name, value)
+        if not name.startswith("_"): self._touch(name)
+
+    def _touch(self, field):
+        object.__setattr__(self, "_dirty", True)
+        if field == "viewed_calendar": object.__setattr__(self, "_activity", None)
+
+    @property
+    def dirty(self): return self._dirty
+
+    @property
+    def activity(self):
+        # Built from viewed_calendar on first use and dropped whenever the calendar changes
+        if self._activity is None: self._activity = ActivityLog(self.viewed_calendar)
+        return self._activity
+
+    def to_dict(self, password_hash, role):
+        return {
+            "schema": SCHEMA_VERSION,
+            "username": self.username, "user_id": self.user_id, "role": role,
+            "password_hash": password_hash,
+            "completed_challenges": sorted(self.completed_challenges),
+            "viewed_calendar": sorted(self.viewed_calendar),
+            "earned_badges": sorted(self.earned_badges),
+            "messages": [m.to_dict() for m in self.messages],
+            "avatar": self.avatar,
+            "preferences": self.preferences,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # Fills the slots directly: going through __init__/__setattr__ would wrap and touch every field twice.
+        # List fields are kept as decoded; the properties above wrap them on first access.
+        user = cls.__new__(cls)
+        init = object.__setattr__
+        init(user, "_dirty", False)
+        init(user, "_version", data.get("version"))
+        init(user, "_activity", None)
+        init(user, "username", data["username"])
+        init(user, "user_id", data["user_id"])
+        for field in cls._TRACKED_SETS + ("messages",):
+            value = data.get(field)
+            init(user, "_" + field, value if type(value) is list else list(value or ()))
+        init(user, "avatar", data.get("avatar"))
+        init(user, "preferences", data.get("preferences") or {})
+        return user
+
+    def mark_clean(self): self._dirty = False
+    def mark_dirty(self): self._dirty = True
 
 class Message:
-    def __init__(self, content, author_id, categories, timestamp=None, replies=None):
+    __slots__ = ("message_id", "content", "timestamp", "author_id", "categories", "replies", "reply_count")
+
+    def __init__(self, content, author_id, categories, timestamp=None, replies=None, message_id=None, reply_count=None):
+        self.message_id = message_id  # assigned by the message store
         self.content = content
         self.timestamp = timestamp if timestamp else datetime.datetime.now().isoformat(timespec="seconds")
         self.author_id = author_id
         self.categories = set(categories)
         # replies is a list of dicts: [{"content": ..., "author_id": ..., "timestamp": ...}, ...]
         self.replies = replies if replies is not None else []
+        # messages loaded from the store only carry the latest replies; reply_count is the whole thread
+        self.reply_count = reply_count if reply_count is not None else len(self.replies)
 
     def to_dict(self):
         # For JSON serialization
         return {
+            "id": self.message_id,
             "content": self.content,
             "timestamp": self.timestamp,
             "author_id": self.author_id,
@@ -35,10 +195,13 @@ class Message:
             author_id=data.get("author_id", ""),
             categories=data.get("categories", []),
             timestamp=data.get("timestamp"),
-            replies=data.get("replies", [])
+            replies=data.get("replies", []),
+            message_id=data.get("id"),
         )
 
 class Challenge:
+    __slots__ = ("title", "description", "difficulty", "equipment_tags")
+
     def __init__(self, title, description, difficulty, equipment_tags):
         self.title = title
         self.description = description
@@ -46,6 +209,8 @@ class Challenge:
         self.equipment_tags = set(equipment_tags.split(";")) if equipment_tags else set()
 
 class Badge:
+    __slots__ = ("name", "description", "requirements", "category")
+
     def __init__(self, name, description, requirements, category):
         self.name = name
         self.description = description
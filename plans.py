@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+from datetime import datetime
+from storage import SqliteStore
+
+# --- Workout plan store ---
+# Plans get an id per (coach, name). Saving a plan again appends a new version instead of rewriting it;
+# readers always see the latest version. Items store exercise titles, resolved against the catalog on read.
+
+class PlanStore(SqliteStore):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS plans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            coach_email TEXT,  -- NULL for plans imported from workout_plans.json, which had no owner
+            name TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            UNIQUE (coach_email, name)
+        );
+        CREATE TABLE IF NOT EXISTS plan_versions (
+            plan_id INTEGER NOT NULL REFERENCES plans(id),
+            version INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (plan_id, version)
+        );
+        CREATE TABLE IF NOT EXISTS plan_items (
+            plan_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            exercise_title TEXT NOT NULL,
+            PRIMARY KEY (plan_id, version, position)
+        );
+        CREATE TABLE IF NOT EXISTS plan_assignments (
+            plan_id INTEGER NOT NULL REFERENCES plans(id),
+            client_email TEXT NOT NULL,
+            assigned_at TEXT NOT NULL,
+            PRIMARY KEY (plan_id, client_email)
+        );
+        CREATE INDEX IF NOT EXISTS idx_plan_assignments_client ON plan_assignments(client_email);
+        CREATE INDEX IF NOT EXISTS idx_plans_coach ON plans(coach_email);
+    """
+
+    def save(self, coach_email, name, exercise_titles):
+        # Returns (plan_id, version); an existing plan with this name gets a new version
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.conn:
+            row = self.conn.execute(
+                "SELECT id FROM plans WHERE coach_email IS ? AND name = ?", (coach_email, name)
+            ).fetchone()
+            if row:
+                plan_id = row[0]
+            else:
+                plan_id = self.conn.execute(
+                    "INSERT INTO plans (coach_email, name, created_at) VALUES (?, ?, ?)", (coach_email, name, now)
+                ).lastrowid
+            version = self.conn.execute(
+                "SELECT COALESCE(MAX(version), 0) + 1 FROM plan_versions WHERE plan_id = ?", (plan_id,)
+            ).fetchone()[0]
+            self.conn.execute("INSERT INTO plan_versions (plan_id, version, created_at) VALUES (?, ?, ?)",
+                              (plan_id, version, now))
+            self.conn.executemany(
+                "INSERT INTO plan_items (plan_id, version, position, exercise_title) VALUES (?, ?, ?, ?)",
+                [(plan_id, version, pos, title) for pos, title in enumerate(exercise_titles)],
+            )
+        return plan_id, version
+
+    def assign(self, plan_id, client_emails):
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO plan_assignments (plan_id, client_email, assigned_at) VALUES (?, ?, ?)",
+                [(plan_id, email, now) for email in client_emails],
+            )
+
+    def unassign(self, plan_id, client_email):
+        with self.conn:
+            self.conn.execute("DELETE FROM plan_assignments WHERE plan_id = ? AND client_email = ?",
+                              (plan_id, client_email))
+
+    def assigned_clients(self, plan_id):
+        return [r[0] for r in self.conn.execute(
+            "SELECT client_email FROM plan_assignments WHERE plan_id = ? ORDER BY client_email", (plan_id,)
+        )]
+
+    def get(self, plan_id, version=None, resolve=None):
+        rows = self._plans("WHERE p.id = ?", (plan_id,), version)
+        return self._hydrate(rows, resolve)[0] if rows else None
+
+    def plans_of(self, coach_email, resolve=None):
+        # The coach's own plans plus legacy plans that have no owner
+        return self._hydrate(self._plans("WHERE p.coach_email = ? OR p.coach_email IS NULL", (coach_email,)), resolve)
+
+    def plans_for_client(self, client_email, coach_emails=None, resolve=None):
+        # Plans assigned to this client, optionally only from the given coaches
+        where, params = "JOIN plan_assignments a ON a.plan_id = p.id WHERE a.client_email = ?", [client_email]
+        if coach_emails is not None:
+            if not coach_emails: return []
+            where += f" AND p.coach_email IN ({','.join('?' * len(coach_emails))})"
+            params += list(coach_emails)
+        return self._hydrate(self._plans(where, params), resolve)
+
+    def iter_records(self):
+        # Every plan with all of its versions and assignments, one plain dict per plan
+        for plan_id, coach_email, name, created_at in self.conn.execute(
+            "SELECT id, coach_email, name, created_at FROM plans ORDER BY id"
+        ).fetchall():
+            versions = []
+            for version, version_created in self.conn.execute(
+                "SELECT version, created_at FROM plan_versions WHERE plan_id = ? ORDER BY version", (plan_id,)
+            ).fetchall():
+                titles = [r[0] for r in self.conn.execute(
+                    "SELECT exercise_title FROM plan_items WHERE plan_id = ? AND version = ? ORDER BY position",
+                    (plan_id, version),
+                )]
+                versions.append({"version": version, "created_at": version_created, "exercise_titles": titles})
+            assignments = [{"client_email": c, "assigned_at": at} for c, at in self.conn.execute(
+                "SELECT client_email, assigned_at FROM plan_assignments WHERE plan_id = ? ORDER BY client_email", (plan_id,)
+            )]
+            yield {"coach_email": coach_email, "name": name, "created_at": created_at,
+                   "versions": versions, "assignments": assignments}
+
+    def restore(self, record):
+        # Inverse of iter_records; versions and assignments that already exist are left alone
+        with self.conn:
+            row = self.conn.execute("SELECT id FROM plans WHERE coach_email IS ? AND name = ?",
+                                    (record["coach_email"], record["name"])).fetchone()
+            # looked up first: UNIQUE does not stop duplicate legacy plans, whose coach_email is NULL
+            plan_id = row[0] if row else self.conn.execute(
+                "INSERT INTO plans (coach_email, name, created_at) VALUES (?, ?, ?)",
+                (record["coach_email"], record["name"], record["created_at"]),
+            ).lastrowid
+            for v in record.get("versions", []):
+                cur = self.conn.execute("INSERT OR IGNORE INTO plan_versions (plan_id, version, created_at) VALUES (?, ?, ?)",
+                                        (plan_id, v["version"], v["created_at"]))
+                if cur.rowcount:
+                    self.conn.executemany(
+                        "INSERT INTO plan_items (plan_id, version, position, exercise_title) VALUES (?, ?, ?, ?)",
+                        [(plan_id, v["version"], pos, title) for pos, title in enumerate(v["exercise_titles"])],
+                    )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO plan_assignments (plan_id, client_email, assigned_at) VALUES (?, ?, ?)",
+                [(plan_id, a["client_email"], a["assigned_at"]) for a in record.get("assignments", [])],
+            )
+        return plan_id
+
+    def _plans(self, where, params, version=None):
+        latest = "(SELECT MAX(version) FROM plan_versions v WHERE v.plan_id = p.id)"
+        return self.conn.execute(
+            f"SELECT p.id, p.coach_email, p.name, {latest if version is None else '?'} "
+            f"FROM plans p {where} ORDER BY p.name",
+            ([version] if version is not None else []) + list(params),
+        ).fetchall()
+
+    def _hydrate(self, rows, resolve):
+        plans = []
+        for plan_id, coach_email, name, version in rows:
+            titles = [r[0] for r in self.conn.execute(
+                "SELECT exercise_title FROM plan_items WHERE plan_id = ? AND version = ? ORDER BY position",
+                (plan_id, version),
+            )]
+            plans.append({
+                "id": plan_id, "coach_email": coach_email, "name": name, "version": version,
+                "exercise_titles": titles,
+                "exercises": [resolve(t) for t in titles] if resolve else None,
+            })
+        return plans
+
+
+def migrate_plans_file(plans_file, plan_store):
+    # One-shot import of the old name -> [titles] file; renamed afterwards so it is not imported twice
+    if not os.path.exists(plans_file): return 0
+    with open(plans_file, "r", encoding="utf-8") as f: plans = json.load(f)
+    for name, titles in plans.items():
+        plan_store.save(None, name, titles)
+    os.replace(plans_file, plans_file + ".migrated")
+    return len(plans)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_plan_store(db_path, plans_file=None):
+    with _stores_lock:
+        if db_path not in _stores:
+            _stores[db_path] = PlanStore(db_path)
+            if plans_file is not None: migrate_plans_file(plans_file, _stores[db_path])
+        return _stores[db_path]
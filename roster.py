@@ -0,0 +1,102 @@
+import threading
+from datetime import datetime
+from storage import SqliteStore
+
+# --- Coach <-> client assignments ---
+# The primary key serves coach -> clients lookups; the second index serves client -> coaches.
+
+class RosterStore(SqliteStore):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS coach_clients (
+            coach_email TEXT NOT NULL,
+            client_email TEXT NOT NULL,
+            assigned_at TEXT NOT NULL,
+            PRIMARY KEY (coach_email, client_email)
+        );
+        CREATE INDEX IF NOT EXISTS idx_coach_clients_client ON coach_clients(client_email, coach_email);
+        CREATE TABLE IF NOT EXISTS roster_meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def assign(self, coach_email, client_email):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO coach_clients (coach_email, client_email, assigned_at) VALUES (?, ?, ?)",
+                (coach_email, client_email, datetime.now().isoformat(timespec="seconds")),
+            )
+
+    def assign_many(self, pairs):
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO coach_clients (coach_email, client_email, assigned_at) VALUES (?, ?, ?)",
+                [(coach, client, now) for coach, client in pairs],
+            )
+
+    def unassign(self, coach_email, client_email):
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM coach_clients WHERE coach_email = ? AND client_email = ?", (coach_email, client_email)
+            )
+
+    def clients_of(self, coach_email):
+        return [r[0] for r in self.conn.execute(
+            "SELECT client_email FROM coach_clients WHERE coach_email = ? ORDER BY client_email", (coach_email,)
+        )]
+
+    def coaches_of(self, client_email):
+        return [r[0] for r in self.conn.execute(
+            "SELECT coach_email FROM coach_clients WHERE client_email = ? ORDER BY coach_email", (client_email,)
+        )]
+
+    def iter_records(self):
+        # Every assignment as a plain dict, straight off the cursor
+        for coach_email, client_email, assigned_at in self.conn.execute(
+            "SELECT coach_email, client_email, assigned_at FROM coach_clients ORDER BY coach_email, client_email"
+        ):
+            yield {"coach_email": coach_email, "client_email": client_email, "assigned_at": assigned_at}
+
+    def restore(self, records):
+        # Inverse of iter_records for a batch of records; existing assignments are left alone. A restored
+        # roster counts as seeded, so the all-coaches seed never runs over it.
+        with self.conn:
+            cur = self.conn.executemany(
+                "INSERT OR IGNORE INTO coach_clients (coach_email, client_email, assigned_at) VALUES (?, ?, ?)",
+                [(r["coach_email"], r["client_email"], r["assigned_at"]) for r in records],
+            )
+            self.conn.execute("INSERT OR IGNORE INTO roster_meta (key, value) VALUES ('seeded', ?)",
+                              (datetime.now().isoformat(timespec="seconds"),))
+        return cur.rowcount
+
+    def is_seeded(self):
+        return self.conn.execute("SELECT 1 FROM roster_meta WHERE key = 'seeded'").fetchone() is not None
+
+    def mark_seeded(self):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO roster_meta (key, value) VALUES ('seeded', ?)",
+                              (datetime.now().isoformat(timespec="seconds"),))
+
+
+def seed_roster(user_store, roster):
+    # One-shot: before assignments existed every client saw every coach, so start from that
+    if roster.is_seeded(): return 0
+    coaches, clients = user_store.emails_by_role("Coach"), user_store.emails_by_role("Client")
+    roster.assign_many((coach, client) for coach in coaches for client in clients)
+    roster.mark_seeded()
+    return len(coaches) * len(clients)
+
+def enroll(user_store, roster, email, role):
+    # New accounts keep the pre-roster default the seed starts from: a new client is assigned to every
+    # coach and a new coach to every client; coaches can unassign from there
+    if role == "Coach": roster.assign_many((email, client) for client in user_store.emails_by_role("Client"))
+    else: roster.assign_many((coach, email) for coach in user_store.emails_by_role("Coach"))
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_roster(db_path, user_store=None):
+    with _stores_lock:
+        if db_path not in _stores:
+            _stores[db_path] = RosterStore(db_path)
+            if user_store is not None: seed_roster(user_store, _stores[db_path])
+        return _stores[db_path]
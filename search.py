@@ -0,0 +1,69 @@
+import re
+import sqlite3
+import threading
+
+# --- Full-text search ---
+# SQLite FTS5 with bm25 ranking. Exercises and quotes live in an in-memory index per process, filled from
+# the shared catalog lists and extended with just the appended rows as the CSVs grow. Messages and replies
+# are indexed inside the message store's own database by triggers (see messages.py), so every post, reply
+# and delete updates the index in the same transaction.
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+def fts_query(text):
+    # User text -> FTS5 query: every word must match, each as a prefix ("squ jum" finds "Squat Jumps").
+    # Only word characters are kept, so FTS5 operators typed by users cannot break the query.
+    terms = _TERM_RE.findall(text or "")
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+class CatalogSearch:
+    SCHEMA = """
+        CREATE VIRTUAL TABLE docs USING fts5(
+            kind UNINDEXED, ref UNINDEXED, title, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        );
+    """
+    # kind -> (title field, body fields)
+    KINDS = {
+        "exercise": ("title", ("description", "body_part", "equipment")),
+        "quote": ("text", ("author",)),
+    }
+    TITLE_WEIGHT = 10.0
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+        self._sources = {}  # kind -> (rows list object, number of rows indexed)
+
+    def sync(self, kind, rows):
+        # rows is the catalog's shared list: a new list means the file was replaced, a longer one that it grew
+        with self._lock:
+            source, size = self._sources.get(kind, (None, 0))
+            if source is not rows:
+                self.conn.execute("DELETE FROM docs WHERE kind = ?", (kind,))
+                size = 0
+            if size < len(rows):
+                title_field, body_fields = self.KINDS[kind]
+                self.conn.executemany(
+                    "INSERT INTO docs (kind, ref, title, body) VALUES (?, ?, ?, ?)",
+                    [(kind, i, rows[i].get(title_field) or "", " ".join(rows[i].get(f) or "" for f in body_fields))
+                     for i in range(size, len(rows))],
+                )
+                self.conn.commit()
+            self._sources[kind] = (rows, len(rows))
+
+    def search(self, text, kind, limit=20):
+        # [(row, score)] best first; score is bm25 (lower is better) with title matches weighted up
+        query = fts_query(text)
+        if not query or kind not in self._sources: return []
+        rows = self._sources[kind][0]
+        with self._lock:
+            try:
+                hits = self.conn.execute(
+                    "SELECT ref, bm25(docs, 0, 0, ?, 1.0) AS score FROM docs "
+                    "WHERE docs MATCH ? AND kind = ? ORDER BY score LIMIT ?",
+                    (self.TITLE_WEIGHT, query, kind, limit),
+                ).fetchall()
+            except sqlite3.OperationalError:
+                return []  # a query FTS5 cannot parse finds nothing rather than breaking the page
+        return [(rows[ref], score) for ref, score in hits if ref < len(rows)]
@@ -0,0 +1,136 @@
+import streamlit as st
+from models import User
+from catalog import get_catalog
+from badges import get_badge_engine
+from coach_analytics import build_achievements_matrix
+from leaderboard import get_leaderboard
+from messages import get_message_store
+from roster import get_roster, enroll
+from plans import get_plan_store
+from credentials import get_credential_pool
+from storage import get_user_store, get_write_behind, put_with_retry, VersionConflict
+from avatars import get_avatar_store
+from metrics import instrumented
+
+# Process-wide stores and the data functions behind each tab. Imported once per process, so the
+# singletons below are shared by every session; per-session state stays in st.session_state.
+
+# --- File paths ---
+USERS_FILE = "data/users.json"
+USERS_DB = "data/users.db"
+CHALLENGES_FILE = "data/exercises.csv"
+QUOTES_FILE = "data/quotes.csv"
+BADGES_FILE = "data/badges.json"
+PLANS_FILE = "data/workout_plans.json"
+AVATARS_DIR = "data/avatars"
+
+user_store = get_user_store(USERS_FILE, USERS_DB)
+avatar_store = get_avatar_store(AVATARS_DIR, user_store)
+catalog = get_catalog(CHALLENGES_FILE, QUOTES_FILE, BADGES_FILE)
+leaderboard = get_leaderboard(user_store)
+message_store = get_message_store(USERS_DB, user_store)
+roster = get_roster(USERS_DB, user_store)
+plan_store = get_plan_store(USERS_DB, PLANS_FILE)
+write_behind = get_write_behind()
+credential_pool = get_credential_pool()
+
+# --- Utility functions ---
+def hash_password(password): return credential_pool.hash(password)
+@instrumented("load_users")
+def load_users(): return user_store.load_all()
+@instrumented("save_users")
+def save_users(users): user_store.save_all(users)
+def get_user(email): return user_store.get(email)
+def user_to_dict(user, password_hash, role): return user.to_dict(password_hash, role)
+def dict_to_user(data): return User.from_dict(data)
+def merge_user_records(current, mine):
+    # Another session saved this user since we loaded it: keep progress from both sides
+    if current:
+        for field in ("completed_challenges", "viewed_calendar", "earned_badges"):
+            mine[field] = sorted(set(current.get(field, [])) | set(mine[field]))
+    return mine
+SAVE_RETRIES = 5  # failed saves are retried with a doubling delay, then left for the session's next save
+def save_key(email, user):
+    # One queue entry per signed-in session: two sessions on one account hold separate User objects and
+    # must not replace each other's queued write; put_with_retry merges them at write time
+    return (email, id(user))
+@instrumented("persist_user")
+def persist_user(email, user, password_hash, role, attempt=0):
+    # Runs on the write-behind thread, so it must not touch st.session_state
+    user.mark_clean()  # edits made while we serialize re-mark the user and get picked up by the next save
+    try:
+        version, saved = put_with_retry(
+            user_store, email, user_to_dict(user, password_hash, role), user._version, merge_user_records
+        )
+    except Exception:
+        # Nothing was written (conflicts after retries, lock timeouts, "database is locked"): keep the user
+        # dirty so the next save still writes it, and retry a bounded number of times in the background
+        user.mark_dirty()
+        if attempt < SAVE_RETRIES:
+            write_behind.schedule(
+                save_key(email, user), lambda: persist_user(email, user, password_hash, role, attempt + 1),
+                delay=write_behind.interval * 2 ** attempt, replace=False,
+            )
+        raise
+    user._version = version
+    for field in ("completed_challenges", "viewed_calendar", "earned_badges"):
+        getattr(user, field).update(saved[field])  # no-op (and stays clean) unless a merge pulled in new items
+@instrumented("save_current_user")
+def save_current_user(immediate=False):
+    if all(k in st.session_state for k in ["user", "email", "password_hash"]):
+        user = st.session_state.user
+        if not user.dirty: return  # read-only page views never touch the disk
+        email, password_hash, role = st.session_state.email, st.session_state.password_hash, st.session_state.role
+        key = save_key(email, user)
+        write_behind.schedule(key, lambda: persist_user(email, user, password_hash, role))
+        if immediate: write_behind.flush(key)
+        if role == "Client":
+            leaderboard.update(email, user.username, len(user.completed_challenges))
+def get_user_rankings(offset=0, limit=10): return leaderboard.page(offset, limit)
+@instrumented("get_client_achievements")
+def get_client_achievements(badges, coach_email):
+    return build_achievements_matrix(user_store, badges, load_challenges_file(), roster.clients_of(coach_email))
+@instrumented("sign_in")
+def sign_in(email, password):
+    data = get_user(email)
+    if not data: return False
+    ok, new_hash = credential_pool.verify(password, data["password_hash"])
+    if ok:
+        if new_hash:
+            # Upgrade legacy SHA-256 (or under-cost) hashes now that we know the password
+            try:
+                data["version"] = user_store.put(email, dict(data, password_hash=new_hash), data.get("version"))
+                data["password_hash"] = new_hash
+            except VersionConflict:
+                pass  # another session saved first; the rehash happens on the next sign-in
+        user = dict_to_user(data)
+        st.session_state.user = user
+        st.session_state.email = email
+        st.session_state.password_hash = data["password_hash"]
+        st.session_state.role = data.get("role", "Client")
+        return True
+    return False
+def sign_up(email, username, password, role):
+    user = User(username, f"user_{username}")
+    password_hash = hash_password(password)
+    try:
+        user_store.put(email, user_to_dict(user, password_hash, role), expected_version=0)
+    except VersionConflict:
+        return False
+    account_created(email, username, role)
+    return True
+def account_created(email, username, role):
+    # A new account joins the leaderboard and the roster (see roster.enroll for the default assignments)
+    enroll(user_store, roster, email, role)
+    if role == "Client": leaderboard.update(email, username, 0)
+def sign_out():
+    for k in ["user", "email", "password_hash", "role"]:
+        if k in st.session_state: del st.session_state[k]
+def load_challenges_file(): return catalog.challenges()
+def load_quotes_file(): return catalog.quotes()
+def load_badges_file(): return catalog.badges()
+def resolve_exercise(title):
+    # Plan items reference exercises by title; keep the title if the exercise was removed from the catalog
+    return catalog.exercise_index().by_title(title) or {"title": title, "missing": True}
+def current_badge_engine():
+    return get_badge_engine(load_badges_file(), catalog.exercise_index())
@@ -0,0 +1,424 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from models import dumps, loads
+from metrics import track
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# --- User store backends ---
+# Both backends expose the same surface: load_all / get / put / put_many / exists / emails_by_role.
+# Records are the plain dicts produced by User.to_dict, plus a "version" counter
+# maintained by the store. put(..., expected_version=n) only succeeds if the stored record is
+# still at version n (0 means "must not exist yet"), otherwise it raises VersionConflict.
+
+class VersionConflict(Exception):
+    pass
+
+
+class FileLock:
+    # Inter-process exclusive lock on <path>.lock, so several Streamlit workers can share a data directory
+    def __init__(self, path, timeout=10):
+        self.path = path + ".lock"
+        self.timeout = timeout
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+")
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if fcntl: fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else: msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                return self
+            except OSError:
+                if time.monotonic() > deadline:
+                    self._file.close()
+                    raise TimeoutError(f"Could not lock {self.path}")
+                time.sleep(0.02)
+
+    def __exit__(self, *exc):
+        if fcntl: fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else: msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+
+
+def atomic_write_json(path, data):
+    # Readers only ever see the old or the new file, never a half-written one
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    text = dumps(data)
+    with track("json.write", bytes_written=len(text)), open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class JsonUserStore:
+    # Writes go through a lock, a write-ahead journal (<path>.journal) and an atomic rename.
+    # A crash after the journal append but before the rename is replayed on the next open or write.
+    def __init__(self, path):
+        self.path = path
+        self.journal_path = path + ".journal"
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        with FileLock(self.path):
+            self._recover()
+
+    def load_all(self):
+        if not os.path.exists(self.path) or os.stat(self.path).st_size == 0: return {}
+        with track("json.read") as span, open(self.path, "r", encoding="utf-8") as f:
+            text = f.read()
+            span.bytes_read = len(text)
+            return loads(text)
+
+    def save_all(self, users):
+        with FileLock(self.path):
+            atomic_write_json(self.path, users)
+
+    def get(self, email):
+        data = self.load_all().get(email)
+        if data is not None: data.setdefault("version", 1)  # records written before versioning
+        return data
+
+    def exists(self, email):
+        return email in self.load_all()
+
+    def put(self, email, data, expected_version=None):
+        with FileLock(self.path):
+            users = self._recover()
+            current = users[email].get("version", 1) if email in users else 0
+            if expected_version is not None and expected_version != current:
+                raise VersionConflict(email)
+            data = dict(data, version=current + 1)
+            self._commit(users, {email: data})
+            return data["version"]
+
+    def put_many(self, records):
+        with FileLock(self.path):
+            users = self._recover()
+            self._commit(users, {
+                email: dict(data, version=users[email].get("version", 1) + 1 if email in users else 1)
+                for email, data in records.items()
+            })
+
+    def _commit(self, users, changes):
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            for email, data in changes.items():
+                f.write(dumps({"email": email, "data": data}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        users.update(changes)
+        atomic_write_json(self.path, users)
+        os.remove(self.journal_path)
+
+    def _recover(self):
+        # Caller holds the lock; returns the current users with any journaled writes applied
+        users = self.load_all()
+        if not os.path.exists(self.journal_path): return users
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = loads(line)
+                except ValueError:
+                    break  # torn final line from a crash mid-append; that write never happened
+                users[entry["email"]] = entry["data"]
+        atomic_write_json(self.path, users)
+        os.remove(self.journal_path)
+        return users
+
+    def emails_by_role(self, role):
+        return [e for e, u in self.load_all().items() if u.get("role", "Client") == role]
+
+    def iter_records(self, role=None):
+        # users.json is one document, so it is parsed whole here; the SQLite store streams row by row
+        for email, data in sorted(self.load_all().items()):
+            if role is None or data.get("role", "Client") == role: yield email, dict(data, version=data.get("version", 1))
+
+    def client_scores(self):
+        return [
+            (e, u.get("username", e), len(u.get("completed_challenges", [])))
+            for e, u in self.load_all().items() if u.get("role", "Client") == "Client"
+        ]
+
+    def client_fields(self, *fields, emails=None):
+        wanted = set(emails) if emails is not None else None
+        return [
+            (e, u.get("username", e), *(u.get(f, []) for f in fields))
+            for e, u in self.load_all().items()
+            if u.get("role", "Client") == "Client" and (wanted is None or e in wanted)
+        ]
+
+
+class _Lease:
+    # A pooled connection lent to one thread; handed back when that thread ends and its thread-local goes
+    __slots__ = ("conn", "store")
+
+    def __init__(self, conn, store):
+        self.conn = conn
+        self.store = store
+
+    def __del__(self):
+        self.store._release(self.conn)
+
+
+class SqliteStore:
+    # Shared connection handling for the SQLite-backed stores; subclasses provide SCHEMA
+    SCHEMA = ""
+    POOL_SIZE = 8  # idle connections kept per store
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._idle = []
+        self._idle_lock = threading.Lock()
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn.executescript(self.SCHEMA)
+        self.migrate()
+
+    def migrate(self):
+        pass
+
+    def _ensure_column(self, table, column, decl):
+        # True when the column had to be added, so callers can backfill it
+        if column in {r[1] for r in self.conn.execute(f"PRAGMA table_info({table})")}: return False
+        with self.conn:
+            self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        return True
+
+    @property
+    def conn(self):
+        # One connection per thread at a time. Streamlit runs every rerun on a fresh script thread, so
+        # connections come from a small per-store pool instead of being opened (with pragmas) per rerun.
+        lease = getattr(self._local, "lease", None)
+        if lease is None:
+            with self._idle_lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            lease = self._local.lease = _Lease(conn, self)
+        return lease.conn
+
+    def _release(self, conn):
+        if conn.in_transaction: conn.rollback()  # the thread died mid-transaction
+        with self._idle_lock:
+            if len(self._idle) < self.POOL_SIZE:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+
+class SqliteUserStore(SqliteStore):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            email TEXT PRIMARY KEY,  -- primary key doubles as the email index
+            username TEXT NOT NULL,
+            role TEXT NOT NULL DEFAULT 'Client',
+            data TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 1
+        );
+        CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
+    """
+    UPSERT = (
+        "INSERT INTO users (email, username, role, data, version) VALUES (?, ?, ?, ?, 1) "
+        "ON CONFLICT(email) DO UPDATE SET username = excluded.username, role = excluded.role, "
+        "data = excluded.data, version = users.version + 1"
+    )
+
+    def migrate(self):
+        self._ensure_column("users", "version", "INTEGER NOT NULL DEFAULT 1")
+
+    def load_all(self):
+        with track("users.load_all") as span:
+            rows = self.conn.execute("SELECT email, data, version FROM users").fetchall()
+            span.bytes_read = sum(len(data) for _, data, _ in rows)
+            return {email: dict(loads(data), version=version) for email, data, version in rows}
+
+    def save_all(self, users):
+        with self.conn:
+            self.conn.execute("DELETE FROM users")
+            self._upsert(users.items())
+
+    def get(self, email):
+        with track("users.get") as span:
+            row = self.conn.execute("SELECT data, version FROM users WHERE email = ?", (email,)).fetchone()
+            if row is None: return None
+            span.bytes_read = len(row[0])
+            return dict(loads(row[0]), version=row[1])
+
+    def exists(self, email):
+        return self.conn.execute("SELECT 1 FROM users WHERE email = ?", (email,)).fetchone() is not None
+
+    def put(self, email, data, expected_version=None):
+        # The version check and the write happen in one transaction, so concurrent writers cannot interleave
+        row = self._row(email, data)
+        with track("users.put", bytes_written=len(row[3])), self.conn:
+            if expected_version is None:
+                self.conn.execute(self.UPSERT, row)
+            elif expected_version == 0:
+                try:
+                    self.conn.execute(
+                        "INSERT INTO users (email, username, role, data, version) VALUES (?, ?, ?, ?, 1)", row
+                    )
+                except sqlite3.IntegrityError:
+                    raise VersionConflict(email) from None
+            else:
+                cur = self.conn.execute(
+                    "UPDATE users SET username = ?, role = ?, data = ?, version = version + 1 "
+                    "WHERE email = ? AND version = ?",
+                    row[1:] + (email, expected_version),
+                )
+                if cur.rowcount == 0: raise VersionConflict(email)
+            return self.conn.execute("SELECT version FROM users WHERE email = ?", (email,)).fetchone()[0]
+
+    def put_many(self, records):
+        with self.conn:
+            self._upsert(records.items())
+
+    def emails_by_role(self, role):
+        return [r[0] for r in self.conn.execute("SELECT email FROM users WHERE role = ?", (role,))]
+
+    def iter_records(self, role=None, batch_size=500):
+        # (email, record) pairs read in email-ordered batches, so exports never hold the whole table and no
+        # read stays open while the caller writes (a stale WAL snapshot would make those writes fail)
+        where, params = ("", []) if role is None else (" AND role = ?", [role])
+        last_email = ""
+        while True:
+            rows = self.conn.execute(
+                f"SELECT email, data, version FROM users WHERE email > ?{where} ORDER BY email LIMIT ?",
+                [last_email] + params + [batch_size],
+            ).fetchall()
+            if not rows: return
+            for email, data, version in rows:
+                yield email, dict(loads(data), version=version)
+            last_email = rows[-1][0]
+
+    def client_scores(self):
+        # json_array_length keeps the leaderboard seed from parsing every record in Python
+        return self.conn.execute(
+            "SELECT email, username, COALESCE(json_array_length(data, '$.completed_challenges'), 0) "
+            "FROM users WHERE role = 'Client'"
+        ).fetchall()
+
+    def client_fields(self, *fields, emails=None):
+        # [(email, username, field1, field2, ...)] for list-valued fields, extracted inside SQLite.
+        # emails restricts the result to those users (looked up by primary key, in chunks).
+        cols = "".join(f", json_extract(data, '$.{f}')" for f in fields)
+        sql = f"SELECT email, username{cols} FROM users WHERE role = 'Client'"
+        if emails is None:
+            rows = self.conn.execute(sql).fetchall()
+        else:
+            emails, rows = list(emails), []
+            for i in range(0, len(emails), 500):
+                chunk = emails[i:i + 500]
+                rows += self.conn.execute(f"{sql} AND email IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+        return [(row[0], row[1], *(loads(v) if v else [] for v in row[2:])) for row in rows]
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is None
+
+    def _row(self, email, data):
+        data = {k: v for k, v in data.items() if k != "version"}  # the column is authoritative
+        return (email, data.get("username", email), data.get("role", "Client"), dumps(data))
+
+    def _upsert(self, items):
+        rows = [self._row(email, d) for email, d in items]
+        with track("users.upsert", bytes_written=sum(len(r[3]) for r in rows)):
+            self.conn.executemany(self.UPSERT, rows)
+
+
+def put_with_retry(store, email, data, expected_version, merge, retries=5):
+    # Optimistic write: on a version conflict, re-read the record, merge our changes into it and try again.
+    # Returns (new_version, data_that_was_written).
+    for _ in range(retries):
+        try:
+            return store.put(email, data, expected_version), data
+        except VersionConflict:
+            current = store.get(email)
+            expected_version = current.get("version", 1) if current else 0
+            data = merge(current, data)
+    raise VersionConflict(email)
+
+
+class WriteBehind:
+    # Debounced write-behind queue: repeated saves of the same key within `interval` seconds collapse
+    # into one write, performed by a background thread (or immediately via flush()). A write scheduled
+    # with a delay (a retry backing off) waits on the background thread until it is due.
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self._pending = {}  # key -> (due time, write)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def schedule(self, key, write, delay=0.0, replace=True):
+        # replace=False keeps a write already queued for this key (it carries newer state than a retry)
+        with self._lock:
+            if not replace and key in self._pending: return
+            self._pending[key] = (time.monotonic() + delay, write)  # newer state replaces the queued one
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def flush(self, key=None, due_only=False):
+        now = time.monotonic()
+        with self._lock:
+            keys = [key] if key is not None else list(self._pending)
+            writes = [self._pending.pop(k)[1] for k in keys
+                      if k in self._pending and (not due_only or self._pending[k][0] <= now)]
+        for write in writes:
+            try:
+                write()
+            except Exception:
+                logging.getLogger(__name__).exception("write-behind save failed")
+
+    def pending(self):
+        return len(self._pending)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval if self._pending else None)  # delayed retries keep the loop ticking
+            self._wakeup.clear()
+            time.sleep(self.interval)  # let a burst of saves coalesce
+            self.flush(due_only=True)
+
+_write_behind = WriteBehind()
+atexit.register(_write_behind.flush)
+
+def get_write_behind(): return _write_behind
+
+
+def migrate_json_to_sqlite(json_path, store):
+    # One-shot: only runs while the SQLite table is still empty, so later JSON edits are never re-imported
+    if not store.is_empty(): return 0
+    users = JsonUserStore(json_path).load_all()
+    if users: store.put_many(users)
+    return len(users)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_user_store(json_path, db_path=None, backend=None, cached=True):
+    # Process-wide, so every Streamlit session shares one store (and one read cache) per path
+    from cache import CachedUserStore
+    backend = backend or os.environ.get("EQUINOX_USER_STORE", "sqlite")
+    key = (backend, json_path, db_path, cached)
+    with _stores_lock:
+        if key not in _stores:
+            if backend == "json":
+                store = JsonUserStore(json_path)
+            else:
+                store = SqliteUserStore(db_path or os.path.splitext(json_path)[0] + ".db")
+                migrate_json_to_sqlite(json_path, store)
+            _stores[key] = CachedUserStore(store) if cached else store
+        return _stores[key]
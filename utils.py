@@ -1,11 +1,15 @@
 import csv
+import gzip
 import json
-from models import Challenge, Badge
-CHALLENGES_FILE = "C:\\Users\\ANIRBAN\\Desktop\\wellness challenge\\data\\exercises.csv"
-QUOTES_FILE = "C:\\Users\\ANIRBAN\\Desktop\\wellness challenge\\data\\quotes.csv"
+import os
+from models import Challenge, Badge, dumps, loads
+from metrics import track
+from storage import FileLock
+CHALLENGE_FIELDS = ["title", "description", "difficulty", "equipment", "body_part"]
+QUOTE_FIELDS = ["text", "author", "category"]
 def load_challenges(filename):
     challenges = []
-    with open(filename, newline='', encoding='utf-8') as f:
+    with track("csv.load", bytes_read=os.path.getsize(filename)), open(filename, newline='', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         for row in reader:
             challenges.append(row)
@@ -13,14 +17,14 @@ def load_challenges(filename):
 
 def load_quotes(filename):
     quotes = []
-    with open(filename, newline='', encoding='utf-8') as f:
+    with track("csv.load", bytes_read=os.path.getsize(filename)), open(filename, newline='', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         for row in reader:
             quotes.append(row)
     return quotes
 
 def load_badges(filename):
-    with open(filename, encoding='utf-8') as f:
+    with track("json.load", bytes_read=os.path.getsize(filename)), open(filename, encoding='utf-8') as f:
         return json.load(f)
 
 def export_json(data, filename):
@@ -31,16 +35,60 @@ def import_json(filename):
     with open(filename, 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def save_challenges(challenge_rows):
-    fieldnames = ["title", "description", "difficulty", "equipment", "body_part"]
-    with open(CHALLENGES_FILE, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(challenge_rows)
+def _open_text(filename, mode):
+    # .gz files are compressed transparently
+    if filename.endswith(".gz"): return gzip.open(filename, mode + "t", encoding="utf-8")
+    return open(filename, mode, encoding="utf-8")
+
+def write_ndjson(filename, records):
+    # One JSON document per line, written as the generator yields them; returns the number written
+    tmp = filename + ".tmp" + (".gz" if filename.endswith(".gz") else "")
+    count = 0
+    with track("ndjson.write") as span, _open_text(tmp, "w") as f:
+        for record in records:
+            line = dumps(record) + "\n"
+            f.write(line)
+            span.bytes_written += len(line)
+            count += 1
+    os.replace(tmp, filename)
+    return count
+
+def read_ndjson(filename):
+    # Yields one record per non-empty line; only the current line is held in memory
+    with _open_text(filename, "r") as f:
+        for line in f:
+            if line.strip(): yield loads(line)
 
-def save_quotes(quotes_rows):
-    fieldnames = ["text", "author", "category"]
-    with open(QUOTES_FILE, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+def write_csv(filename, fieldnames, rows):
+    # Full rewrite through a temp file + rename, so readers never see a partial file
+    tmp = filename + ".tmp"
+    with track("csv.write") as span, open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
         writer.writeheader()
-        writer.writerows(quotes_rows)
\ No newline at end of file
+        writer.writerows(rows)
+        span.bytes_written = f.tell()
+    os.replace(tmp, filename)
+
+def append_csv(filename, fieldnames, rows):
+    # Appends rows without touching existing ones; writes the header if the file is new or empty
+    new_file = not os.path.exists(filename) or os.stat(filename).st_size == 0
+    if not new_file:
+        with open(filename, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) not in (b"\n", b"\r")
+    with track("csv.append") as span, open(filename, "a", newline="", encoding="utf-8") as f:
+        start = f.tell()
+        if not new_file and needs_newline: f.write("\r\n")
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+        if new_file: writer.writeheader()
+        writer.writerows(rows)
+        span.bytes_written = f.tell() - start
+
+def save_challenges(challenge_rows, filename):
+    # Same inter-process lock as the catalog's appends, so rows appended meanwhile are not overwritten
+    with FileLock(filename):
+        write_csv(filename, CHALLENGE_FIELDS, challenge_rows)
+
+def save_quotes(quotes_rows, filename):
+    with FileLock(filename):
+        write_csv(filename, QUOTE_FIELDS, quotes_rows)
\ No newline at end of file
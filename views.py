@@ -0,0 +1,429 @@
+import streamlit as st
+import random, csv, io, calendar, time
+from datetime import datetime
+from models import Message
+from utils import CHALLENGE_FIELDS
+import metrics
+from services import (
+    catalog, user_store, leaderboard, message_store, roster, plan_store, get_user, dict_to_user,
+    save_current_user, get_user_rankings, get_client_achievements, load_challenges_file, load_quotes_file,
+    load_badges_file, resolve_exercise, current_badge_engine,
+)
+
+# Each tab is a render function; app.py runs only the one the user has selected, so the data
+# loading behind the other tabs (quotes, calendar, messages, rankings) is skipped on every rerun.
+
+# --- Search boxes ---
+SEARCH_LIMIT = 10
+
+def render_exercise_search():
+    query = st.text_input("Search exercises", key="exercise_search", placeholder="e.g. squat, kettlebell, core")
+    if not query.strip(): return
+    hits = catalog.search(query, "exercise", SEARCH_LIMIT)
+    if not hits: st.info("No exercises match your search.")
+    for ex, _ in hits:
+        st.markdown(
+            f"**{ex['title']}** — {ex['description']}  \n"
+            f"*Difficulty: {ex['difficulty']}; Equipment: {ex['equipment']}; Body Part: {ex.get('body_part', 'N/A')}*"
+        )
+
+def render_quote_search():
+    query = st.text_input("Search quotes", key="quote_search", placeholder="word or author")
+    if not query.strip(): return
+    hits = catalog.search(query, "quote", SEARCH_LIMIT)
+    if not hits: st.info("No quotes match your search.")
+    for quote, _ in hits:
+        st.write(f'"{quote["text"]}" - *{quote["author"]}*')
+
+def render_message_search(coach_emails):
+    query = st.text_input("Search messages and replies", key="message_search")
+    if not query.strip(): return
+    hits = message_store.search(query, coach_emails, SEARCH_LIMIT)
+    if not hits: st.info("No messages match your search.")
+    for _, msg in hits:
+        st.markdown(f"**{msg.content}** \n_{msg.timestamp}_ — {msg.reply_count} repl{'y' if msg.reply_count == 1 else 'ies'}")
+    st.divider()
+
+
+# --- Challenges Tab ---
+def render_challenges(user, role):
+    render_exercise_search()
+    if role == "Coach":
+        st.header("Create New Workout")
+        workout_title = st.text_input("Workout Title")
+        workout_desc = st.text_area("Workout Description")
+        workout_difficulty = st.selectbox("Difficulty", ["Beginner", "Intermediate", "Advanced"])
+        workout_equipment = st.text_input("Equipment")
+        workout_body_part = st.text_input("Body Part")
+        if st.button("Add Workout"):
+            if not workout_title or not workout_desc:
+                st.warning("Please fill in all required fields.")
+            else:
+                new_workout = {
+                    "title": workout_title,
+                    "description": workout_desc,
+                    "difficulty": workout_difficulty,
+                    "equipment": workout_equipment,
+                    "body_part": workout_body_part,
+                }
+                # Appended to exercises.csv; existing rows are never rewritten
+                added, _ = catalog.add_exercises([new_workout])  # also indexed for search
+                if added:
+                    st.success("Workout added!")
+                    st.rerun()
+                else:
+                    st.warning(f"A workout called '{workout_title}' already exists.")
+        with st.expander("Bulk Import Workouts (CSV)"):
+            st.caption("Columns: " + ", ".join(CHALLENGE_FIELDS))
+            import_file = st.file_uploader("Workouts CSV", type=["csv"], key="bulk_import_csv")
+            if import_file and st.button("Import Workouts"):
+                rows = list(csv.DictReader(io.StringIO(import_file.getvalue().decode("utf-8-sig"))))
+                added, skipped = catalog.add_exercises(rows)
+                st.success(f"Imported {len(added)} workout(s); skipped {len(skipped)} duplicate or untitled row(s).")
+    else:
+        exercise_index = catalog.exercise_index()
+        st.header("Create My Workout Program")
+        selected_body_part = st.selectbox("Choose Body Part", ["All"] + exercise_index.body_parts)
+        body_filter = None if selected_body_part == "All" else selected_body_part
+        sel_difficulty = st.selectbox("Choose Difficulty", ["All"] + exercise_index.difficulties(body_filter))
+        sel_equipment = st.selectbox("Choose Equipment", ["All"] + exercise_index.equipment(body_filter))
+        filters = {
+            "body_part": body_filter,
+            "difficulty": None if sel_difficulty == "All" else sel_difficulty,
+            "equipment": None if sel_equipment == "All" else sel_equipment,
+        }
+        st.markdown("### Generate a Workout Program")
+        if st.button("Create My Workout Program"):
+            if not exercise_index.count(**filters):
+                st.warning("No exercises found for this selection.")
+            else:
+                st.session_state["workout_program"] = exercise_index.sample(5, **filters)
+        if "workout_program" in st.session_state:
+            st.markdown("#### Your Workout Program:")
+            for idx, ex in enumerate(st.session_state["workout_program"], 1):
+                st.markdown(
+                    f"**{idx}. {ex['title']}**\n\n{ex['description']}\n\n"
+                    f"*Difficulty: {ex['difficulty']}; Equipment: {ex['equipment']}; Body Part: {ex.get('body_part', 'N/A')}*"
+                )
+            if st.button("Mark Program as Completed"):
+                for ex in st.session_state["workout_program"]:
+                    user.completed_challenges.add(ex["title"])
+                today_str = datetime.now().strftime("%Y-%m-%d")
+                user.viewed_calendar.add(today_str)
+                st.success("Workout program completed!")
+                for badge_name in current_badge_engine().on_event(user, "completion"):
+                    st.success(f"🏅 New badge unlocked: {badge_name}")
+                save_current_user()
+                del st.session_state["workout_program"]
+        st.write(f"Challenges completed: {len(user.completed_challenges)}")
+    render_plans(user, role)
+
+# --- Motivation/Calendar Tab (formerly Motivation) ---
+QUOTE_SECONDS = 20
+
+def quote_for_slot(quotes, slot):
+    # Same quote for everyone within a slot; seeding by slot keeps it stable across reruns
+    return quotes[random.Random(slot).randrange(len(quotes))]
+
+@st.fragment(run_every=QUOTE_SECONDS)
+def render_quote(quotes):
+    # Reruns on its own every QUOTE_SECONDS; only this fragment re-executes, not the script.
+    # Fragment reruns reuse the quotes passed in by the last full run, so the file is not re-read.
+    now = time.time()
+    quote = quote_for_slot(quotes, int(now // QUOTE_SECONDS))
+    st.write(f'"{quote["text"]}" - *{quote["author"]}*')
+    st.progress(now % QUOTE_SECONDS / QUOTE_SECONDS)
+
+def render_calendar(user, role):
+    # --- Motivation Feature: quote rotates every QUOTE_SECONDS ---
+    quotes = load_quotes_file()
+    st.header("Daily Motivation")
+    if quotes:
+        render_quote(quotes)
+    else:
+        st.info("No motivational quotes available.")
+    render_quote_search()
+
+    # --- Calendar Section ---
+    st.markdown("### 🗓️ Workout Calendar")
+    today = datetime.now()
+    year, month = today.year, today.month
+    month_days = calendar.monthrange(year, month)[1]
+    first_weekday = calendar.monthrange(year, month)[0]  # 0=Monday
+
+    # Get set of completed days for this month
+    completed_days = user.activity.days_in_month(year, month)
+    streak_col, best_col, month_col = st.columns(3)
+    streak_col.metric("Current streak", f"{user.activity.current_streak()} days")
+    best_col.metric("Longest streak", f"{user.activity.longest_streak()} days")
+    month_col.metric("Active days this month", len(completed_days))
+
+    # Build calendar grid
+    week_days = ["Mo", "Tu", "We", "Th", "Fr", "Sa", "Su"]
+    cal = [["" for _ in range(7)] for _ in range(6)]
+    day = 1
+    for week in range(6):
+        for wd in range(7):
+            if (week == 0 and wd < first_weekday) or day > month_days:
+                continue
+            style = ""
+            if day == today.day:
+                style = "background-color:#ffe066; border-radius:8px;"  # Highlight today
+            if day in completed_days:
+                style = "background-color:#b6fcb6; border-radius:8px;"  # Green for completed
+            cal[week][wd] = f"<div style='padding:6px;{style}'>{day}</div>"
+            day += 1
+
+    # Remove empty weeks
+    cal = [row for row in cal if any(cell for cell in row)]
+
+    # Display as HTML table
+    table_html = "<table style='border-collapse:collapse;width:100%;text-align:center;'>"
+    table_html += "<tr>" + "".join(f"<th>{wd}</th>" for wd in week_days) + "</tr>"
+    for row in cal:
+        table_html += "<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>"
+    table_html += "</table>"
+    st.markdown(table_html, unsafe_allow_html=True)
+
+# --- Achievements Tab ---
+def render_achievements(user, role):
+    badges = load_badges_file()
+    if role == "Coach":
+        st.header("Client Achievements Overview")
+        with st.expander("Manage My Clients"):
+            my_clients = roster.clients_of(st.session_state.email)
+            st.write(f"{len(my_clients)} client(s) assigned to you.")
+            add_email = st.text_input("Client email", key="roster_add_email").strip().lower()
+            if st.button("Add Client", key="roster_add_btn"):
+                client = get_user(add_email) if add_email else None
+                if not client or client.get("role", "Client") != "Client":
+                    st.error("No client account with that email.")
+                else:
+                    roster.assign(st.session_state.email, add_email)
+                    st.success(f"{client['username']} added to your clients.")
+                    st.rerun()
+            if my_clients:
+                remove_email = st.selectbox("Remove a client", my_clients, key="roster_remove_email")
+                if st.button("Remove Client", key="roster_remove_btn"):
+                    roster.unassign(st.session_state.email, remove_email)
+                    st.success("Client removed.")
+                    st.rerun()
+        achievements = get_client_achievements(badges, st.session_state.email)
+        if not len(achievements):
+            st.info("No client data to display.")
+        else:
+            view = st.radio("Show", ["Badges", "Exercises"], horizontal=True, key="ach_view")
+            kind = "badges" if view == "Badges" else "exercises"
+            columns = achievements.badge_names if kind == "badges" else achievements.exercise_titles
+            f1, f2, f3 = st.columns(3)
+            search = f1.text_input("Search clients", key="ach_search")
+            require = f2.multiselect("Must have", columns, key="ach_require")
+            sort_by = f3.selectbox("Sort by", ["Total", "Client"] + columns, key="ach_sort")
+            page_size = 50
+            _, matches = achievements.frame(kind, search, require, limit=0)
+            num_pages = max(1, -(-matches // page_size))
+            page = st.number_input("Page", min_value=1, max_value=num_pages, value=1, key="ach_page") if num_pages > 1 else 1
+            df, _ = achievements.frame(
+                kind, search, require, sort_by, ascending=sort_by == "Client",
+                offset=(page - 1) * page_size, limit=page_size,
+            )
+            st.caption(f"{matches} client(s)")
+            st.dataframe(df, use_container_width=True, hide_index=True)
+        if st.button("Recompute Badges for My Clients"):
+            # Only this coach's roster; a full pass over every client is `python badges.py`
+            updated = current_badge_engine().backfill(user_store, roster.clients_of(st.session_state.email))
+            st.success(f"Badges updated for {updated} client(s).")
+            st.rerun()
+    else:
+        st.header("Achievements")
+        # Badges are awarded by the rule engine when a workout is completed; this tab only displays them
+        for badge in badges:
+            if badge["name"] in user.earned_badges:
+                st.success(f"🏅 {badge['name']}: {badge['description']}")
+        for badge in badges:
+            if badge["name"] not in user.earned_badges:
+                st.info(f"🔒 {badge['name']} (Locked)")
+        st.write(f"Badges earned: {', '.join(user.earned_badges) if user.earned_badges else 'None yet.'}")
+
+# --- Messages Tab ---
+REPLY_PAGE_SIZE = 20
+
+def render_thread(msg):
+    # Messages arrive with their latest few replies; "Load earlier replies" pages back through the
+    # thread by reply id, and the number of pages opened is remembered per message for this session
+    if not msg.reply_count: return
+    mid = msg.message_id
+    st.markdown(f"**Replies ({msg.reply_count}):**")
+    replies, cursor = list(msg.replies), (msg.replies[0]["id"] if len(msg.replies) < msg.reply_count else None)
+    for _ in range(st.session_state.get(f"thread_pages_{mid}", 0)):
+        if cursor is None: break
+        page, cursor = message_store.replies(mid, REPLY_PAGE_SIZE, before_id=cursor)
+        replies = page + replies
+    if cursor is not None and st.button(f"Load earlier replies ({msg.reply_count - len(replies)} more)", key=f"thread_more_{mid}"):
+        st.session_state[f"thread_pages_{mid}"] = st.session_state.get(f"thread_pages_{mid}", 0) + 1
+        st.rerun()
+    for reply in replies:
+        st.write(f"- {reply['content']} _(by {reply['author_id']} at {reply['timestamp']})_")
+
+def post_reply(message_id, author, content):
+    # An insert into the thread's log; the message record itself is not rewritten
+    message_store.add_reply(message_id, {
+        "content": content, "author_id": author, "timestamp": datetime.now().isoformat(timespec="seconds"),
+    })
+
+def render_messages(user, role):
+    st.header("Coach–Client Message Board")
+    page_size = 20
+    # Coaches search their own board, clients the boards of the coaches they are assigned to
+    my_coaches = [st.session_state.email] if role == "Coach" else roster.coaches_of(st.session_state.email)
+    render_message_search(my_coaches)
+    if role == "Coach":
+        st.subheader("Post a Message for Your Clients")
+        new_message = st.text_input("Write a message", key="new_message_input")
+        new_category = st.selectbox("Category", ["General", "Urgent", "Info"], key="new_msg_cat")
+        if st.button("Post Message", key="post_coach_msg_btn"):
+            if new_message.strip():
+                message_store.post(st.session_state.email, Message(new_message.strip(), user.user_id, [new_category]))
+                st.success("Message posted for clients!")
+                st.rerun()
+        st.subheader("Your Messages (Threads)")
+        num_pages = max(1, -(-message_store.count([st.session_state.email]) // page_size))
+        page = st.number_input("Page", min_value=1, max_value=num_pages, value=1, key="coach_msg_page") if num_pages > 1 else 1
+        my_messages = message_store.by_coach(st.session_state.email, (page - 1) * page_size, page_size)
+        if my_messages:
+            for msg in my_messages:
+                mid = msg.message_id
+                st.markdown(f"**{msg.content}** \n_{msg.timestamp}_ — {', '.join(msg.categories)}")
+                render_thread(msg)
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.button(f"Delete Message #{mid}", key=f"del_msg_{mid}"):
+                        message_store.delete(mid)
+                        st.success("Message deleted!")
+                        st.rerun()
+                with col2, st.form(f"coach_reply_form_{mid}", clear_on_submit=True):
+                    # a form, so typing a reply does not rerun the whole board
+                    reply_text = st.text_input(f"Reply to message #{mid}", key=f"coach_reply_{mid}")
+                    if st.form_submit_button(f"Post Reply #{mid}") and reply_text.strip():
+                        post_reply(mid, user.username, reply_text.strip())
+                        st.success("Reply posted!")
+                        st.rerun()
+        else:
+            st.info("No messages posted yet.")
+    else:
+        # Clients only see messages from the coaches they are assigned to
+        num_pages = max(1, -(-message_store.count(my_coaches) // page_size))
+        page = st.number_input("Page", min_value=1, max_value=num_pages, value=1, key="client_msg_page") if num_pages > 1 else 1
+        coach_msgs = message_store.timeline((page - 1) * page_size, page_size, my_coaches)
+        # Only the coaches on this page are looked up, from the shared user cache
+        coach_names = {}
+        for coach_email, _ in coach_msgs:
+            if coach_email not in coach_names:
+                coach = user_store.get_user(coach_email, dict_to_user)
+                coach_names[coach_email] = coach.username if coach else coach_email
+        if coach_msgs:
+            for coach_email, msg in coach_msgs:
+                mid = msg.message_id
+                st.markdown(
+                    f"**From Coach {coach_names[coach_email]}:** \n> {msg.content} \n_{msg.timestamp}_ — {', '.join(msg.categories)}"
+                )
+                render_thread(msg)
+                with st.form(f"reply_form_{mid}", clear_on_submit=True):
+                    reply_input = st.text_input("Your reply:", key=f"client_reply_input_{mid}")
+                    reply_submit = st.form_submit_button("Reply")
+                    if reply_submit and reply_input.strip():
+                        post_reply(mid, user.username, reply_input.strip())
+                        st.success("Reply posted!")
+                        st.rerun()
+        else:
+            st.info("No coach messages available yet.")
+
+# --- Leaderboard Tab ---
+def render_leaderboard(user, role):
+    st.header("🏅 User Leaderboard")
+    page_size = 10
+    num_pages = max(1, -(-len(leaderboard) // page_size))
+    page = st.number_input("Page", min_value=1, max_value=num_pages, value=1, key="leaderboard_page") if num_pages > 1 else 1
+    rankings = get_user_rankings((page - 1) * page_size, page_size)
+    for entry in rankings:
+        st.write(f"{leaderboard.rank(entry['email'])}. **{entry['username']}** — {entry['completed']} workouts completed")
+    my_rank = leaderboard.rank(st.session_state.email)
+    if my_rank:
+        st.info(f"Your rank: {my_rank}")
+
+# --- Workout Plans (shown under the Challenges tab) ---
+def render_plans(user, role):
+    if role == "Coach":
+        st.header("Create Workout Plan for Clients")
+        challenges = load_challenges_file()
+        workout_titles = list(dict.fromkeys(c["title"] for c in challenges))
+        plan_name = st.text_input("Plan Name")
+        selected_workouts = st.multiselect("Select Workouts for Plan", workout_titles)
+        my_clients = roster.clients_of(st.session_state.email)
+        plan_clients = st.multiselect("Assign to Clients", my_clients, key="plan_clients")
+        if st.button("Create Plan"):
+            if not plan_name or not selected_workouts:
+                st.warning("Please provide a plan name and select at least one workout.")
+            else:
+                # Saving an existing plan name adds a new version; older versions are kept
+                plan_id, version = plan_store.save(st.session_state.email, plan_name.strip(), selected_workouts)
+                if plan_clients: plan_store.assign(plan_id, plan_clients)
+                st.success(f"Workout plan created! (version {version})")
+        st.header("Available Workout Plans for Clients")
+        my_plans = plan_store.plans_of(st.session_state.email)
+        if my_plans:
+            for plan in my_plans:
+                assigned = plan_store.assigned_clients(plan["id"])
+                st.markdown(
+                    f"**{plan['name']}** (v{plan['version']}): {', '.join(plan['exercise_titles'])}"
+                    + (f"  \n_Assigned to: {', '.join(assigned)}_" if assigned else "")
+                )
+        else:
+            st.info("No workout plans created yet.")
+    else:
+        st.header("My Assigned Plans")
+        # Only plans from coaches this client is currently assigned to
+        my_plans = plan_store.plans_for_client(
+            st.session_state.email, roster.coaches_of(st.session_state.email), resolve_exercise
+        )
+        if my_plans:
+            for plan in my_plans:
+                with st.expander(f"{plan['name']} (v{plan['version']})"):
+                    for idx, ex in enumerate(plan["exercises"], 1):
+                        if ex.get("missing"):
+                            st.markdown(f"**{idx}. {ex['title']}** _(no longer in the catalog)_")
+                        else:
+                            st.markdown(
+                                f"**{idx}. {ex['title']}** — {ex['description']}  \n"
+                                f"*Difficulty: {ex['difficulty']}; Equipment: {ex['equipment']}; Body Part: {ex.get('body_part', 'N/A')}*"
+                            )
+        else:
+            st.info("Your coach hasn't assigned you a plan yet.")
+
+
+# --- Performance Panel (coaches, EQUINOX_DEBUG_PANEL=1) ---
+def render_debug_panel(session):
+    with st.sidebar.expander("Performance"):
+        if session.last_rerun:
+            seconds, rerun = session.last_rerun
+            st.caption(f"Last complete rerun: {seconds * 1000:.1f} ms")
+            st.dataframe(rerun.rows(), hide_index=True)
+        st.caption(f"This session: {session.reruns} reruns")
+        st.dataframe(session.totals.rows(), hide_index=True)
+        st.caption("This process")
+        st.dataframe(metrics.process.rows(), hide_index=True)
+        st.download_button("Download metrics (Prometheus text)", metrics.prometheus_text(), "equinox_metrics.prom")
+
+
+TABS = {
+    "Coach": [
+        ("🏋 Manage Challenges", render_challenges), ("🗓 Calendar", render_calendar),
+        ("🏆 Achievements", render_achievements), ("💬 Messages", render_messages),
+        ("🏅 Leaderboard", render_leaderboard),
+    ],
+    "Client": [
+        ("🏋 Challenges", render_challenges), ("🗓 Calendar", render_calendar),
+        ("🏆 Badges", render_achievements), ("💬 Messages", render_messages),
+        ("🏅 Leaderboard", render_leaderboard),
+    ],
+}